@@ -0,0 +1,230 @@
+"""
+Benchmarks over the bundled wordle and term.ooo dictionaries. Every
+benchmark runs a fixed amount of work in a fresh process, so its peak RSS
+is its own. Run from the root of the repository:
+
+    python -m benchmarks.suite --save      # record the baseline
+    python -m benchmarks.suite             # compare against it
+
+A benchmark regresses when it takes longer, or peaks at more memory, than
+its baseline by more than the tolerance. The exit status is 1 if any does.
+"""
+import json
+import os
+import platform
+import random
+import sys
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from gameplay.bench import bench
+from gameplay.computer import Computer
+from gameplay.data import fetch_cache, get_cache_file, save_cache
+from gameplay.memo import GuessMemo
+from model import Engine, MaskInstance, PatternSpace
+from strategies import Entropy, ExpectedSize, Greedy, Heuristic, Sampling
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATASETS = {
+    "wordle": ("wordle/answers", "wordle/words"),
+    "term.ooo": ("term.ooo/respostas", "term.ooo/termos"),
+}
+BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+# Seed of every random choice, so each run does the same work
+SEED = 1
+MASKS = 200000
+GROUPINGS = 2000
+TURNS = 4000
+GAMES = 50
+STRATEGIES = {"heuristic": Heuristic, "greedy": Greedy, "entropy": Entropy, "expected-size": ExpectedSize,
+              # Seeded, so every run samples the same answers
+              "sampling": lambda: Sampling(0.05, seed=SEED)}
+
+
+def new_engine(dataset: str, hard_mode: bool = False) -> Engine:
+    answers, words = DATASETS[dataset]
+    return Engine(os.path.join(ROOT, answers), os.path.join(ROOT, words), hard_mode)
+
+
+def _timed(work: Callable[[], Optional[dict]]) -> dict:
+    start = time.perf_counter()
+    details = work() or dict()
+    return {"seconds": time.perf_counter() - start, **details}
+
+
+def mask_for_answer(dataset: str) -> dict:
+    engine = new_engine(dataset)
+    rng = random.Random(SEED)
+    pairs = [(rng.choice(engine.answer_list), rng.choice(engine.word_list)) for _ in range(MASKS)]
+
+    def work():
+        for answer, guess in pairs:
+            MaskInstance.for_answer(answer, guess)
+        return {"operations": len(pairs)}
+    return _timed(work)
+
+
+def compute_grouping(dataset: str) -> dict:
+    engine = new_engine(dataset)
+    engine.patterns.codes
+    guesses = random.Random(SEED).sample(engine.word_list, GROUPINGS)
+
+    def work():
+        for guess in guesses:
+            engine.compute_grouping(guess)
+        return {"operations": len(guesses)}
+    return _timed(work)
+
+
+def space_build(dataset: str) -> dict:
+    engine = new_engine(dataset)
+
+    def work():
+        patterns = engine.patterns
+        patterns.build(1, progress=None)
+        space = PatternSpace.splitting(patterns.word_array, patterns.answer_array, engine.pattern_rows(),
+                                       patterns.length, engine.is_answer)
+        return {"words": len(space), "answers": len(space.answers)}
+    return _timed(work)
+
+
+def cache_save_load(dataset: str) -> dict:
+    engine = new_engine(dataset)
+    patterns = engine.patterns
+    patterns.build(1, progress=None)
+    space = PatternSpace(patterns.word_array, patterns.answer_array, patterns.codes, patterns.length)
+    game_id = "benchmark-%s-%d" % (dataset, os.getpid())
+    try:
+        start = time.perf_counter()
+        save_cache(game_id, space)
+        saved = time.perf_counter()
+        loaded = fetch_cache(game_id)
+        # Loading only maps the file: reading every code is what pages it in
+        int(loaded.codes.sum(dtype=int))
+        return {"seconds": time.perf_counter() - start, "save_seconds": saved - start,
+                "load_seconds": time.perf_counter() - saved}
+    finally:
+        os.remove(get_cache_file(game_id))
+
+
+def engine_pruned(dataset: str, hard_mode: bool) -> dict:
+    engine = new_engine(dataset, hard_mode)
+    rng = random.Random(SEED)
+    # Two turns of each game: one from the start, one from where it left
+    games = [(rng.choice(engine.answer_list), rng.choice(engine.word_list), rng.choice(engine.word_list))
+             for _ in range(TURNS // 2)]
+    # Builds the letter indexes once, as any game does on its first turn
+    engine.pruned(MaskInstance.for_answer(*games[0][:2]))
+
+    def work():
+        for answer, first, second in games:
+            pruned = engine.pruned(MaskInstance.for_answer(answer, first))
+            pruned.pruned(MaskInstance.for_answer(answer, second))
+        return {"operations": 2 * len(games)}
+    return _timed(work)
+
+
+def solve(dataset: str, strategy: str, memo: bool = False) -> dict:
+    answers = sorted(new_engine(dataset).eligible_answers)
+    answers = random.Random(SEED).sample(answers, GAMES)
+    # Only solving is measured, with the solution space already cached
+    Computer(new_engine(dataset)).solution_space
+
+    def work():
+        # A memo of this run only: choices remembered by earlier runs would leave nothing to measure
+        report, = bench(lambda hard_mode: new_engine(dataset, hard_mode), [STRATEGIES[strategy]()], [], answers,
+                        memo=GuessMemo() if memo else None)
+        solved = sum(report.guesses.values())
+        return {"games": report.games, "failures": report.failures,
+                "mean_guesses": sum(n * c for n, c in report.guesses.items()) / max(solved, 1)}
+    return _timed(work)
+
+
+def benchmarks(datasets: List[str]) -> Dict[str, tuple]:
+    """
+    Every benchmark by name, as the function running it and its arguments
+    """
+    suite = dict()
+    for dataset in datasets:
+        suite["%s/mask.for_answer" % dataset] = (mask_for_answer, dataset)
+        suite["%s/compute_grouping" % dataset] = (compute_grouping, dataset)
+        suite["%s/space.build" % dataset] = (space_build, dataset)
+        suite["%s/cache.save_load" % dataset] = (cache_save_load, dataset)
+        suite["%s/engine.pruned" % dataset] = (engine_pruned, dataset, False)
+        suite["%s/engine.pruned.hard" % dataset] = (engine_pruned, dataset, True)
+        for strategy in STRATEGIES:
+            suite["%s/solve.%s" % (dataset, strategy)] = (solve, dataset, strategy)
+        suite["%s/solve.heuristic.memo" % dataset] = (solve, dataset, "heuristic", True)
+    return suite
+
+
+def _run(benchmark, *args) -> dict:
+    import resource
+
+    result = benchmark(*args)
+    result["peak_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return result
+
+
+def run(benchmark, *args) -> dict:
+    # A process of its own, so memory left over by other benchmarks does not count
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        return pool.submit(_run, benchmark, *args).result()
+
+
+def regressions(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    found = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        for key in ("seconds", "peak_rss_kb"):
+            before, after = baseline[name][key], result[key]
+            if after > before * (1 + tolerance):
+                found.append("%s: %s went from %.4g to %.4g (%+.1f%%)"
+                             % (name, key, before, after, 100 * (after / before - 1)))
+    return found
+
+
+def main():
+    argp = ArgumentParser(description="Benchmark parseltongue against a saved baseline")
+    argp.add_argument("--dataset", choices=DATASETS.keys(), nargs="+", default=list(DATASETS.keys()))
+    argp.add_argument("--only", type=str, nargs="+", help="run the benchmarks whose name holds any of these")
+    argp.add_argument("--baseline", type=str, default=BASELINE, help="baseline file (JSON)")
+    argp.add_argument("--save", action="store_true", help="record the results as the baseline")
+    argp.add_argument("--tolerance", type=float, default=0.25,
+                      help="how much slower or larger than the baseline is a regression (0.25 for 25%%)")
+    arguments = argp.parse_args()
+
+    suite = benchmarks(arguments.dataset)
+    if arguments.only:
+        suite = {name: task for name, task in suite.items() if any(part in name for part in arguments.only)}
+    baseline = dict()
+    if os.path.exists(arguments.baseline):
+        with open(arguments.baseline) as infile:
+            baseline = json.load(infile)["results"]
+
+    results = dict()
+    for name, (benchmark, *args) in suite.items():
+        results[name] = result = run(benchmark, *args)
+        before = baseline.get(name)
+        change = " (%+.1f%%)" % (100 * (result["seconds"] / before["seconds"] - 1)) if before else ""
+        print("%-36s %9.3fs%-10s %8d KB" % (name, result["seconds"], change, result["peak_rss_kb"]), flush=True)
+
+    if arguments.save:
+        with open(arguments.baseline, "w") as outfile:
+            json.dump({"machine": platform.platform(), "processor": platform.processor(),
+                       "python": platform.python_version(), "results": {**baseline, **results}}, outfile, indent=2)
+        print("Saved baseline to %s" % arguments.baseline)
+        return
+
+    found = regressions(results, baseline, arguments.tolerance)
+    for regression in found:
+        print("REGRESSION %s" % regression)
+    if found:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
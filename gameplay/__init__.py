@@ -1,6 +1,8 @@
 from .player import Player
 from .human import HumanPlayer
 from .space_search import SpaceSearch
+from .boards_search import BoardsSearch
+from .tree_search import TreeSearch, load_tree
 
 from .guidance import Guidance, CompleteGuidance, RemainingAnswerGuidance
 
@@ -0,0 +1,136 @@
+import copy
+import logging
+import os
+import time
+from collections import Counter
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from model import Engine, MaskInstance
+from strategies import Strategy
+from .computer import Computer
+from .memo import GuessMemo
+from .space_search import SpaceSearch
+from .workers import main_computer, worker_computer, worker_pool
+
+MAX_GUESSES = 6
+
+
+class BenchReport:
+    """
+    Outcome of one strategy (with one opener) over many games
+    """
+
+    def __init__(self, strategy: Strategy, opener: Sequence[str], opener_time: Optional[float] = None):
+        self.strategy = strategy
+        self.opener = tuple(opener)
+        # Time the strategy took to pick the opener, when it was not given
+        self.opener_time = opener_time
+        self.guesses = Counter()
+        self.failures = 0
+        self.latencies: List[float] = []
+        self.elapsed = 0.0
+
+    @property
+    def name(self) -> str:
+        return "%s opening with %s" % (type(self.strategy).__name__, ", ".join(self.opener).upper())
+
+    @property
+    def games(self) -> int:
+        return sum(self.guesses.values()) + self.failures
+
+    def add(self, guesses: Optional[int], latencies: List[float]):
+        if guesses is None:
+            self.failures += 1
+        else:
+            self.guesses[guesses] += 1
+        self.latencies.extend(latencies)
+
+    def __str__(self):
+        solved = sum(self.guesses.values())
+        mean = sum(n * count for n, count in self.guesses.items()) / solved if solved else float("nan")
+        distribution = " | ".join("%d: %d" % (n, self.guesses[n]) for n in range(1, MAX_GUESSES + 1))
+        lines = [self.name,
+                 "  games: %d  solved: %d  failure rate: %.2f%%  mean guesses: %.4f"
+                 % (self.games, solved, 100 * self.failures / max(self.games, 1), mean),
+                 "  distribution: %s | failed: %d" % (distribution, self.failures),
+                 "  throughput: %.2f games/s" % (self.games / self.elapsed if self.elapsed else float("nan"))]
+        if self.latencies:
+            p50, p90, p99 = np.percentile(self.latencies, [50, 90, 99]) * 1000
+            lines.append("  turn latency: p50 %.2fms  p90 %.2fms  p99 %.2fms  max %.2fms"
+                         % (p50, p90, p99, max(self.latencies) * 1000))
+        if self.opener_time is not None:
+            lines.append("  opener chosen once in %.2fs" % self.opener_time)
+        return "\n".join(lines)
+
+
+def play(computer: Computer, strategy: Strategy, opener: Sequence[str], answer: str,
+         max_guesses: int = MAX_GUESSES) -> Tuple[Optional[int], List[float]]:
+    """
+    Solve a single game against a known answer, starting from the state of
+    computer (whose engine must be an immutable Engine, so it can be shared).
+    Returns how many guesses it took (None if it failed) and how long each
+    turn took.
+    """
+    solver = SpaceSearch(copy.copy(computer), strategy, *opener, verbose=False)
+    latencies = []
+    for turn in range(1, max_guesses + 1):
+        start = time.perf_counter()
+        guess = solver.provide()
+        mask = MaskInstance.for_answer(answer, guess)
+        if mask.mask.solved:
+            latencies.append(time.perf_counter() - start)
+            return turn, latencies
+        solver.accept(mask)
+        latencies.append(time.perf_counter() - start)
+    return None, latencies
+
+
+def _play_task(task):
+    strategy, opener, answer = task
+    return play(worker_computer(), strategy, opener, answer)
+
+
+def bench(new_engine: Callable[..., Engine], strategies: Sequence[Strategy], openers: Sequence[Sequence[str]],
+          answers: Sequence[str], hard_mode: bool = False, workers: int = 1,
+          memo: Optional[GuessMemo] = None) -> List[BenchReport]:
+    """
+    Play every strategy, with every opener, against every answer, on engines
+    made by new_engine(hard_mode=...) (which workers must be able to pickle,
+    such as a class or a functools.partial of it). An empty
+    opener lets the strategy choose it: as it always faces the same starting
+    state, that choice is made once and then reused for every game.
+    Games are spread across worker processes (0 means one per CPU). With a
+    memo, guesses are only chosen once for every state they reach.
+    """
+    workers = workers or os.cpu_count() or 1
+    computer = main_computer(new_engine(hard_mode=hard_mode), workers, memo)
+
+    reports = []
+    for strategy in strategies:
+        for opener in openers or [()]:
+            if opener:
+                reports.append(BenchReport(strategy, opener))
+            else:
+                start = time.perf_counter()
+                chosen = computer.best_guess(strategy)
+                reports.append(BenchReport(strategy, [chosen], time.perf_counter() - start))
+
+    logging.info("Playing %d games with %d workers" % (len(reports) * len(answers), workers))
+    if workers == 1:
+        _run(reports, answers, map)
+    else:
+        with worker_pool(new_engine, hard_mode, workers, memo) as pool:
+            chunk = max(1, len(answers) // (workers * 16))
+            _run(reports, answers, lambda task, tasks: pool.map(task, tasks, chunksize=chunk))
+    return reports
+
+
+def _run(reports: List[BenchReport], answers: Sequence[str], mapper):
+    # One report at a time, so each gets its own throughput
+    for report in reports:
+        start = time.perf_counter()
+        for guesses, latencies in mapper(_play_task, [(report.strategy, report.opener, a) for a in answers]):
+            report.add(guesses, latencies)
+        report.elapsed = time.perf_counter() - start
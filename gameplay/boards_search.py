@@ -0,0 +1,57 @@
+import logging
+
+import numpy as np
+
+from model import Boards, MaskInstance
+from strategies import Scoring
+from .computer import Computer
+from .player import Player
+
+
+class BoardsSearch(Player):
+    """
+    Plays several boards at once (quordle, octordle...), keeping apart the
+    answers still eligible on each board, and guessing the word that scores
+    best on all of them together.
+
+    Every board is scored out of the solution space of the whole game (the
+    one cached for computer), restricted to the columns of its answers, so
+    nothing is recomputed as boards get narrowed. A board left with a single
+    answer gets it guessed right away.
+    """
+
+    def __init__(self, computer: Computer, boards: Boards, strategy: Scoring, *first_words: str,
+                 verbose: bool = True):
+        self.__boards = boards
+        self.__strategy = strategy
+        self.__space = computer.solution_space
+        answer_index = self.__space.answer_index
+        # Column of the space of every answer of the engine
+        self.__columns = np.array([answer_index[a] for a in boards.engine.patterns.answers], dtype=int)
+        self.__first_word = list(reversed(first_words))
+        self.__verbose = verbose
+
+    def provide(self) -> str:
+        if self.__first_word:
+            choice = self.__first_word.pop()
+        else:
+            choice = self.__choose()
+        if self.__verbose:
+            print(" > %s" % choice)
+        return choice
+
+    def __choose(self) -> str:
+        boards = self.__boards.answer_ids()
+        for ids in boards:
+            if len(ids) == 1:
+                return self.__boards.engine.patterns.answers[ids[0]]
+        allowed = None
+        engine = self.__boards.engine
+        if engine.hard_mode:
+            allowed = np.isin(self.__space.words, engine.word_list)
+        logging.debug("Answers left on each board: %s" % [len(ids) for ids in boards])
+        return self.__strategy.best_jointly(self.__space, [self.__columns[ids] for ids in boards],
+                                            allowed=allowed)[0]
+
+    def accept(self, *mask: MaskInstance):
+        self.__boards = self.__boards.pruned(*mask)
@@ -1,54 +1,137 @@
 import logging
+from typing import Any, Callable, Optional
 
-from model import Engine, MaskInstance, Space
-from .data import fetch_cache, save_cache
+from model import Engine, MaskInstance, PatternSpace, Space
+from model.instrumentation import count, timed
+from model.patterns import PatternMatrix, pattern_dtype
+from strategies import Strategy
+from .data import build_cache, fetch_cache, save_cache
+from .memo import GuessMemo
+
+# Spaces whose codes take more bytes than this are built on disk, tile by tile
+IN_MEMORY_LIMIT = 1 << 30
 
 class Computer:
     __mem_cache = None
 
-    def __init__(self, engine: Engine, hard_mode=False):
+    def __init__(self, engine: Engine, hard_mode=False, workers: int = 1, memo: Optional[GuessMemo] = None):
         self.__engine = engine
         self.__hard_mode = hard_mode
+        # Processes used to compute the space on a cache miss (0 for one per CPU)
+        self.__workers = workers
+        # Choices already made in states of the game, shared by copies of this computer
+        self.__memo = memo
+        # Engine state the cached space was built for
+        self.__answer_ids = None
+        self.__word_ids = None
 
     @property
     def solution_space(self) -> Space:
-        if self.__mem_cache:
-            return self.__mem_cache
-        return self.__load_groups()
+        if self.__mem_cache is None:
+            count("computer.space.miss")
+            self.__mem_cache = self.__load_groups()
+        elif self.__answer_ids is not self.__engine.answer_ids or self.__word_ids is not self.__engine.word_ids:
+            # The engine was pruned since (by us or by whoever shares it)
+            count("computer.space.narrowed")
+            self.__mem_cache = self.__narrow_groups()
+        else:
+            count("computer.space.hit")
+        self.__answer_ids = self.__engine.answer_ids
+        self.__word_ids = self.__engine.word_ids
+        return self.__mem_cache
+
+    def remembered(self, kind: str, compute: Callable[[], Any]) -> Any:
+        """
+        What compute works out in the current state of the game, as the memo
+        (if any) remembers it under kind. The state is told by the game id
+        of the engine, so a hit does not even need the solution space.
+        """
+        if self.__memo is None:
+            return compute()
+        key = self.__engine.patterns.fingerprint, kind, self.__engine.game_id()
+        value = self.__memo.get(*key)
+        if value is None:
+            value = compute()
+            self.__memo.put(*key, value)
+        return value
+
+    def best_guess(self, strategy: Strategy) -> str:
+        return self.remembered(strategy.key, lambda: strategy.choose(self.solution_space))
 
+    @timed("computer.load_groups")
     def __load_groups(self) -> Space:
-        game_id = self.__engine.game_id()
+        engine = self.__engine
+        patterns = engine.patterns
+        root = self.__root_groups()
+        if len(engine.answer_ids) == len(patterns.answers) and len(engine.word_ids) == len(patterns.words):
+            return root
+        # Pruned states (such as the first one not remembered by the memo) are narrowed from the space of
+        # the whole game, which is cached once for all of them
+        logging.debug("Narrowing the space of the game down to %d answers" % len(engine.answer_ids))
+        words = None if len(engine.word_ids) == len(patterns.words) else engine.words
+        return PatternSpace.of(root).narrowed(engine.answer_list, engine.is_answer, words)
+
+    def __root_groups(self) -> Space:
+        """
+        The space of the whole game, from the cache or computed into it
+        """
+        patterns = self.__engine.patterns
+        game_id = patterns.fingerprint
         cached = fetch_cache(game_id)
         if cached:
-            self.__mem_cache = cached
             return cached
-        else:
-            computed = self.__compute_groups()
-            self.__mem_cache = computed
-            save_cache(game_id, computed)
-            return computed
+        size = len(patterns.words) * len(patterns.answers) * pattern_dtype(patterns.length).itemsize
+        if size > IN_MEMORY_LIMIT:
+            return self.__build_groups(game_id)
+        computed = self.__compute_groups()
+        save_cache(game_id, computed)
+        return computed
+
+    @timed("computer.narrow_groups")
+    def __narrow_groups(self) -> Space:
+        engine = self.__engine
+        logging.debug("Narrowing %d words down to %d answers" % (len(self.__mem_cache), len(engine.answer_ids)))
+        words = None if self.__word_ids is engine.word_ids else engine.words
+        try:
+            return self.__mem_cache.narrowed(engine.answer_list, engine.is_answer, words)
+        except KeyError:
+            logging.debug("Engine is not a narrower version of the cached space")
+            return self.__load_groups()
 
     def bust(self):
         self.__mem_cache = None
 
+    @timed("computer.compute_groups")
     def __compute_groups(self) -> Space:
-        computed: Space = dict()
-        words = self.__engine.words
-        logging.debug("Calculating all groups for %d words" % len(words))
-        n_words = len(words)
-        for i, word in enumerate(words):
-            groups = self.__engine.compute_grouping(word)
-            # This means that this does not help us
-            if (len(groups) == 1) and not self.__engine.is_answer(word):
-                continue
-            computed[word] = groups
-            if logging.root.level <= logging.DEBUG:
-                print("Progress: %.02f%%" % (100 * i / n_words), end='\r')
-        return computed
+        patterns = self.__engine.patterns
+        patterns.build(self.__workers)
+        logging.debug("Calculating all groups for %d words" % len(patterns.words))
+        return PatternSpace.splitting(patterns.word_array, patterns.answer_array, patterns.codes, patterns.length,
+                                      lambda word: word in patterns.answer_index)
+
+    @timed("computer.build_groups")
+    def __build_groups(self, game_id: str) -> Space:
+        """
+        Compute the space straight into the cache, with every word kept (as
+        whether a word splits the answers is only known once it is computed)
+        """
+        patterns = self.__engine.patterns
+        logging.info("Building the space of %d words and %d answers on disk" %
+                     (len(patterns.words), len(patterns.answers)))
+
+        def compute(ranges):
+            tiles = [(start, patterns.words[start:stop]) for start, stop in ranges]
+            yield from patterns.compute_tiles(tiles, self.__workers)
+
+        return build_cache(game_id, patterns.word_array, patterns.answer_array, patterns.length,
+                           pattern_dtype(patterns.length), compute)
+
+    @property
+    def patterns(self) -> PatternMatrix:
+        return self.__engine.patterns
 
     def is_answer(self, word: str) -> bool:
         return self.__engine.is_answer(word)
 
     def update(self, *mi: MaskInstance):
         self.__engine = self.__engine.pruned(*mi)
-        self.__mem_cache = None
@@ -1,47 +1,222 @@
-import gzip
 import json
 import logging
 import os
+import struct
 import tempfile
-from typing import Dict
+from typing import Callable, Iterator, List, Optional, Tuple
 
-from model import Mask, Space
+import numpy as np
 
+from model import PatternSpace, Space
+from model.common import mapped, padded
+from model.instrumentation import count, timed
+from model.tree import DecisionTree
 
-def jsonify(space: Space):
-    return {k:{p.__hash__():l for p,l in v.items()} for k,v in space.items()}
+# Cache layout, all little endian:
+#   header: magic, format version, letters per word, words, answers, bytes per code
+#   words:   words x letters UCS4 characters
+#   answers: answers x letters UCS4 characters
+#   codes:   words x answers pattern codes, row major
+MAGIC = b"SLYTHRN\0"
+VERSION = 1
+HEADER = struct.Struct("<8sIIIII")
+# Codes computed (and written) at once by build_cache
+TILE_CELLS = 1 << 24
+# Progress of build_cache: words per tile and tiles, then one byte per tile, set once it is written
+PROGRESS = struct.Struct("<II")
 
 
-def unjsonify(json_map: Dict):
-    return {k:{Mask.numbered(p):l for p,l in v.items()} for k,v in json_map.items()}
-
-
-def fetch_cache(game_id: str, gzipped=False):
+@timed("cache.fetch")
+def fetch_cache(game_id: str):
+    """
+    Open the cached solution space for this game, if there is a valid one.
+    The file is memory mapped read only: it is paged in lazily and shared
+    with every other process using the same cache.
+    """
     logging.debug("Loading cached decision tree for %s (faster than recalculating)..." % game_id)
-    cachefile = get_cache_file(game_id, gzipped)
-    if os.path.exists(cachefile):
-        with do_open(cachefile, gzipped) as infile:
-            return unjsonify(json.load(infile))
-    return None
+    cachefile = get_cache_file(game_id)
+    if not os.path.exists(cachefile):
+        count("cache.miss")
+        return None
+    try:
+        space = load_space(cachefile)
+    except ValueError as e:
+        logging.warning("Ignoring unusable cache file %s: %s" % (cachefile, e))
+        count("cache.miss")
+        return None
+    count("cache.hit")
+    return space
 
 
-def get_cache_file(game_id: str, gzipped=False):
-    logging.debug("Calculating hash for universe")
-    hash_file_name = "slytherin-cache.%s.json%s" % (game_id, ".gz" if gzipped else "")
+def get_cache_file(game_id: str):
+    hash_file_name = "slytherin-cache.%s.v%d.bin" % (game_id, VERSION)
     cachefile = os.path.join(tempfile.gettempdir(), hash_file_name)
     logging.debug("Cache file is " + cachefile)
     return cachefile
 
 
-def save_cache(game_id: str, data: Space, gzipped=False):
+@timed("cache.save")
+def save_cache(game_id: str, data: Space):
+    """
+    Write the solution space to the cache, atomically
+    """
     logging.debug("Saving decision tree to cache... ")
-    cachefile = get_cache_file(game_id, gzipped)
-    with do_open(cachefile, gzipped, "w") as outfile:
-        json.dump(jsonify(data), outfile)
+    replace_atomically(get_cache_file(game_id), lambda outfile: write_space(outfile, PatternSpace.of(data)))
+
+
+def fetch_tree(game_id: str, name: str):
+    """
+    Load the decision tree saved for this game under name, if any
+    """
+    treefile = get_tree_file(game_id, name)
+    if not os.path.exists(treefile):
+        return None
+    with open(treefile, "r") as infile:
+        return DecisionTree.from_json(json.load(infile))
+
+
+def get_tree_file(game_id: str, name: str):
+    return os.path.join(tempfile.gettempdir(), "slytherin-tree.%s.%s.json" % (game_id, name))
+
+
+def save_tree(game_id: str, name: str, tree: DecisionTree):
+    replace_atomically(get_tree_file(game_id, name), lambda outfile: outfile.write(json.dumps(tree.to_json()).encode()))
+
+
+def replace_atomically(filename: str, write):
+    """
+    Call write with a binary file that replaces filename once write is done.
+    The file is written under a temporary name and renamed in place, so
+    readers either see the previous file or the complete new one, never a
+    partial file.
+    """
+    directory, name = os.path.split(filename)
+    fd, temp_name = tempfile.mkstemp(prefix=name, suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as outfile:
+            write(outfile)
+            outfile.flush()
+            os.fsync(outfile.fileno())
+        os.chmod(temp_name, 0o644)
+        os.replace(temp_name, filename)
+    except BaseException:
+        os.unlink(temp_name)
+        raise
+
+
+def _sections(length: int, n_words: int, n_answers: int, code_size: int):
+    words_at = padded(HEADER.size)
+    answers_at = padded(words_at + 4 * length * n_words)
+    codes_at = padded(answers_at + 4 * length * n_answers)
+    return words_at, answers_at, codes_at, codes_at + code_size * n_words * n_answers
+
+
+def write_space(outfile, space: PatternSpace):
+    codes = np.ascontiguousarray(space.codes, dtype=space.codes.dtype.newbyteorder("<"))
+    n_words, n_answers = len(space.words), len(space.answers)
+    words_at, answers_at, codes_at, _ = _sections(space.length, n_words, n_answers, codes.itemsize)
+    text = "<U%d" % max(space.length, 1)
+
+    outfile.write(HEADER.pack(MAGIC, VERSION, space.length, n_words, n_answers, codes.itemsize))
+    outfile.write(b"\0" * (words_at - HEADER.size))
+    outfile.write(np.asarray(space.words, dtype=text).tobytes())
+    outfile.write(b"\0" * (answers_at - outfile.tell()))
+    outfile.write(np.asarray(space.answers, dtype=text).tobytes())
+    outfile.write(b"\0" * (codes_at - outfile.tell()))
+    outfile.write(codes.tobytes())
+
+
+def load_space(cachefile: str) -> PatternSpace:
+    with open(cachefile, "rb") as infile:
+        header = infile.read(HEADER.size)
+    if len(header) < HEADER.size:
+        raise ValueError("truncated header")
+    magic, version, length, n_words, n_answers, code_size = HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not a version %d cache" % VERSION)
+    words_at, answers_at, codes_at, end = _sections(length, n_words, n_answers, code_size)
+    if os.path.getsize(cachefile) != end:
+        raise ValueError("expected %d bytes, found %d" % (end, os.path.getsize(cachefile)))
+
+    text = "<U%d" % max(length, 1)
+    return PatternSpace(mapped(cachefile, text, words_at, (n_words,)),
+                        mapped(cachefile, text, answers_at, (n_answers,)),
+                        mapped(cachefile, "<u%d" % code_size, codes_at, (n_words, n_answers)),
+                        length)
+
+
+def build_cache(game_id: str, words: np.ndarray, answers: np.ndarray, length: int, code_type: np.dtype,
+                compute: Callable[[List[Tuple[int, int]]], Iterator[Tuple[int, np.ndarray]]]) -> PatternSpace:
+    """
+    Build the cached solution space straight on disk, for spaces too large
+    to be held in memory: the file is laid out in full first, and its codes
+    are then filled tile by tile (a range of words against every answer)
+    through a memory map. compute is given the (start, stop) ranges of words
+    left to do, and yields (start, codes) for each of them, in any order.
+
+    A tile is only marked done once its codes are written, so a build that
+    gets interrupted resumes with the tiles it had left. The file replaces
+    the cache once complete, and is returned memory mapped, as fetch_cache
+    would.
+    """
+    cachefile = get_cache_file(game_id)
+    partial, progress_file = cachefile + ".partial", cachefile + ".progress"
+    n_words, n_answers = len(words), len(answers)
+    code_type = np.dtype(code_type).newbyteorder("<")
+    tile_rows = max(1, TILE_CELLS // max(n_answers, 1))
+    n_tiles = -(-n_words // tile_rows)
+    words_at, answers_at, codes_at, end = _sections(length, n_words, n_answers, code_type.itemsize)
+    header = HEADER.pack(MAGIC, VERSION, length, n_words, n_answers, code_type.itemsize)
+    progress_header = PROGRESS.pack(tile_rows, n_tiles)
+
+    done = _progress(partial, progress_file, header, end, progress_header)
+    if done is None:
+        logging.debug("Laying out %s for %d tiles" % (partial, n_tiles))
+        text = "<U%d" % max(length, 1)
+        with open(partial, "wb") as outfile:
+            outfile.write(header)
+            outfile.write(b"\0" * (words_at - HEADER.size))
+            outfile.write(np.asarray(words, dtype=text).tobytes())
+            outfile.write(b"\0" * (answers_at - outfile.tell()))
+            outfile.write(np.asarray(answers, dtype=text).tobytes())
+            # Codes are left as a hole, which tiles fill in
+            outfile.truncate(end)
+        with open(progress_file, "wb") as outfile:
+            outfile.write(progress_header + bytes(n_tiles))
+        done = np.zeros(n_tiles, dtype=bool)
+    else:
+        logging.info("Resuming the build of %s: %d of %d tiles left" % (partial, n_tiles - done.sum(), n_tiles))
 
+    todo = [(t * tile_rows, min(n_words, (t + 1) * tile_rows)) for t in np.flatnonzero(~done)]
+    if todo and n_answers:
+        codes = np.memmap(partial, dtype=code_type, mode="r+", offset=codes_at, shape=(n_words, n_answers))
+        with open(progress_file, "r+b") as progress:
+            for finished, (start, tile) in enumerate(compute(todo), start=1):
+                codes[start:start + len(tile)] = tile
+                codes.flush()
+                progress.seek(PROGRESS.size + start // tile_rows)
+                progress.write(b"\1")
+                progress.flush()
+                logging.debug("Progress: %d of %d tiles left" % (len(todo) - finished, n_tiles))
+        del codes
+    os.replace(partial, cachefile)
+    os.remove(progress_file)
+    return load_space(cachefile)
 
-def do_open(file: str, gzipped: bool, flag: str = "r"):
-    if gzipped:
-        return gzip.open(file, flag + "t")
-    return open(file, flag)
 
+def _progress(partial: str, progress_file: str, header: bytes, end: int,
+              progress_header: bytes) -> Optional[np.ndarray]:
+    """
+    Tiles already done by an earlier build of the same space, if there is one to resume
+    """
+    if not (os.path.exists(partial) and os.path.exists(progress_file)) or os.path.getsize(partial) != end:
+        return None
+    with open(partial, "rb") as infile:
+        if infile.read(HEADER.size) != header:
+            return None
+    with open(progress_file, "rb") as infile:
+        if infile.read(PROGRESS.size) != progress_header:
+            return None
+        done = np.frombuffer(infile.read(), dtype=np.uint8).astype(bool)
+    n_tiles = PROGRESS.unpack(progress_header)[1]
+    return done if len(done) == n_tiles else None
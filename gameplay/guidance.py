@@ -1,7 +1,10 @@
-from typing import Iterable, Tuple
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
 
 from .computer import Computer
-from model import Engine, Grouping
+from model import Engine, Grouping, PatternSpace
+from model.space import ranked, top
+from strategies import Sampling
 
 
 class Guidance:
@@ -20,26 +23,60 @@ class RemainingAnswerGuidance:
 
 
 class CompleteGuidance(Guidance):
-    def __init__(self, engine: Engine, computer: Computer, skip_first: bool = True):
+    """
+    Shows the best words to guess at every turn: the rankings of stats or,
+    with a time_budget (in seconds), the words telling the most about the
+    answer as estimated within it
+    """
+    def __init__(self, engine: Engine, computer: Computer, skip_first: bool = True,
+                 time_budget: Optional[float] = None):
         self.__engine = engine
         self.__computer = computer
         self.__skip_first = skip_first
+        self.__time_budget = time_budget
         self.__first = True
 
     def guide(self):
         if not (self.__skip_first and self.__first):
-            stats(self.__engine.eligible_answers, self.__computer.solution_space, cutoff=5)
+            answers = self.__engine.eligible_answers
+            budget = self.__time_budget
+            if budget is not None and len(answers) > 1:
+                best = self.__computer.remembered(
+                    "estimates(5, %g)" % budget, lambda: estimates(self.__computer.solution_space, budget, cutoff=5))
+                estimated_stats(answers, best)
+            else:
+                best = None
+                if len(answers) > 1:
+                    best = self.__computer.remembered(
+                        "rankings(5)", lambda: rankings(answers, self.__computer.solution_space, cutoff=5))
+                stats(answers, None, cutoff=5, best=best)
         self.__first = False
-        self.__computer.bust()
 
 
-def stats(answers, sol_space, cutoff: int = 10):
-    if len(answers) == 1:
-        print("\nThere's only one eligible answer to the game:\n* %s" % next(answers.__iter__()))
-        return
+# A word in the rankings: the word, whether it may be the answer, how many answers it may find on spot,
+# how many groups it splits the answers in and the size of the largest one
+RankedWord = Tuple[str, bool, int, int, int]
 
-    print("Words with a star to their left are one of %d eligible answers to the game" % len(answers))
-    print("\nTop 10 words with most splits (meaning they will divide most your solution)")
+
+def rankings(answers, sol_space, cutoff: int = 10) -> Dict[str, List[RankedWord]]:
+    """
+    The best words of the solution space, by what they achieve:
+
+    - splits: most groups (then smallest worst case, then answers first)
+    - on_spot: most answers found on spot (then most splits)
+    - worst_case: smallest worst case (then most splits)
+    - answers: the eligible answers with most splits
+
+    Words splitting the answers exactly like the one ranked before them are
+    skipped, unless they are eligible answers.
+    """
+    # Words are ranked from their group counts: groupings are only built for the words shown
+    sol_space = PatternSpace.of(sol_space)
+    metrics = sol_space.metrics
+    n_splits, worst_case, hit_it_big, is_answer = metrics.splits, metrics.largest, metrics.singletons, metrics.is_answer
+
+    def words_by(*keys) -> Iterable[Tuple[str, Grouping]]:
+        return ((sol_space.word_list[i], sol_space[sol_space.word_list[i]]) for i in ranked(*keys))
 
     def gen_best(best: Iterable[Tuple[str, Grouping]], limit: int):
         counter = 0
@@ -52,50 +89,74 @@ def stats(answers, sol_space, cutoff: int = 10):
                 counter += 1
             last = cur
 
-    def sort_by_slices(grouping: Grouping, is_answer: bool):
-        n_splits = len(grouping)
-        worst_case = max(len(v) for v in grouping.values())
-        return n_splits, -worst_case, is_answer
-
-    base_sorting = sorted(sol_space.items(), key=lambda s: sort_by_slices(s[1], s[0] in answers), reverse=True)
-    most_splits = gen_best(base_sorting, cutoff)
-    for word, grouping in most_splits:
-        n_splits, worst_case, is_answer = sort_by_slices(grouping, word in answers)
-        print("%s%s: divides space in %d splits with largest split sized %d" %
-              ("* " if is_answer else "  ", word, n_splits, -worst_case))
+    def details(word: str) -> RankedWord:
+        i = sol_space.index[word]
+        return word, bool(is_answer[i]), int(hit_it_big[i]), int(n_splits[i]), int(worst_case[i])
+
+    base_sorting = n_splits, -worst_case, is_answer
+    return {
+        "splits": [details(w) for w, _ in gen_best(words_by(*base_sorting), cutoff)],
+        "on_spot": [details(w) for w, _ in gen_best(words_by(hit_it_big, n_splits, is_answer, -worst_case), cutoff)],
+        "worst_case": [details(w) for w, _ in gen_best(words_by(-worst_case, n_splits, is_answer), cutoff)],
+        "answers": [details(sol_space.word_list[i])
+                    for i in top(cutoff, is_answer, *base_sorting) if is_answer[i]],
+    }
+
+
+def stats(answers, sol_space, cutoff: int = 10, best: Optional[Dict[str, List[RankedWord]]] = None):
+    """
+    Print the rankings of the solution space, or best when they are already known
+    """
+    if len(answers) == 1:
+        print("\nThere's only one eligible answer to the game:\n* %s" % next(answers.__iter__()))
+        return
+
+    print("Words with a star to their left are one of %d eligible answers to the game" % len(answers))
+    print("\nTop 10 words with most splits (meaning they will divide most your solution)")
+    if best is None:
+        best = rankings(answers, sol_space, cutoff)
+
+    def star(answer: bool) -> str:
+        return "* " if answer else "  "
+
+    for word, answer, _, splits, worst in best["splits"]:
+        print("%s%s: divides space in %d splits with largest split sized %d" % (star(answer), word, splits, worst))
     print("\nTop %d words with most chance of finding a solution on spot:" % cutoff)
 
-    def sort_by_allin(grouping: Grouping, is_answer: bool):
-        hit_it_big = sum(1 for v in grouping.values() if len(v) == 1)
-        n_splits = len(grouping)
-        worst_case = max(len(v) for v in grouping.values())
-        return hit_it_big, n_splits, is_answer, -worst_case
-
-    most_all_in = gen_best(sorted(sol_space.items(),
-                         key=lambda s: sort_by_allin(s[1], s[0] in answers),
-                         reverse=True), cutoff)
-    for word, grouping in most_all_in:
-        hit_it_big, n_splits, is_answer, worst_case = sort_by_allin(grouping, word in answers)
+    for word, answer, hits, splits, worst in best["on_spot"]:
         print(
             "%s%s: may determine among %d answers on spot, and divides space in %d splits with largest split sized %d" %
-            ("* " if is_answer else "  ", word, hit_it_big, n_splits, -worst_case))
+            (star(answer), word, hits, splits, worst))
     print("\nTop %d words with best worst case scenarios (meaning they guarantee it won't be that bad)" % cutoff)
 
-    def sort_by_wcs(grouping: Grouping, is_answer: bool):
-        n_splits = len(grouping)
-        worst_case = max(len(v) for v in grouping.values())
-        return worst_case, -n_splits, not is_answer
-
-    best_of_worst = gen_best(sorted(sol_space.items(),
-                           key=lambda s: sort_by_wcs(s[1], s[0] in answers)), cutoff)
-    for word, grouping in best_of_worst:
-        n_splits, worst_case, is_answer = sort_by_slices(grouping, word in answers)
-        print("%s%s: has worst case scenario sized %d and divides space in %d splits " %
-              ("* " if is_answer else "  ", word, -worst_case, n_splits))
+    for word, answer, _, splits, worst in best["worst_case"]:
+        print("%s%s: has worst case scenario sized %d and divides space in %d splits " % (star(answer), word, worst, splits))
 
     print("\nTop %d solutions that divide the solution space the most" % cutoff)
-    best_solutions = list(filter(lambda b: b[0] in answers, base_sorting))[:cutoff]
-    for word, grouping in best_solutions:
-        n_splits, worst_case, is_answer = sort_by_slices(grouping, word in answers)
-        print("* %s: has worst case scenario sized %d and divides space in %d splits " %
-              (word, -worst_case, n_splits))
+    for word, _, _, splits, worst in best["answers"]:
+        print("* %s: has worst case scenario sized %d and divides space in %d splits " % (word, worst, splits))
+
+
+# A word in the estimates: the word, whether it may be the answer, its estimated bits and their standard error
+EstimatedWord = Tuple[str, bool, float, float]
+
+
+def estimates(sol_space, time_budget: float, cutoff: int = 10) -> dict:
+    """
+    The words of the solution space telling the most about the answer, as
+    estimated within time_budget seconds by the sampling strategy, and how
+    many answers the estimates were sampled from
+    """
+    sol_space = PatternSpace.of(sol_space)
+    words, bits, error, sampled = Sampling(time_budget).race(sol_space, cutoff, time.perf_counter() + time_budget)
+    best: List[EstimatedWord] = [(sol_space.word_list[i], bool(sol_space.answer_words[i]), float(b), float(e))
+                                 for i, b, e in zip(words, bits, error)]
+    return {"sampled": sampled, "answers": len(sol_space.answers), "best": best}
+
+
+def estimated_stats(answers, best: dict):
+    print("Words with a star to their left are one of %d eligible answers to the game" % len(answers))
+    print("\nTop %d words telling the most about the answer, estimated from %d of %d answers"
+          % (len(best["best"]), best["sampled"], best["answers"]))
+    for word, answer, bits, error in best["best"]:
+        print("%s%s: tells %.2f bits (give or take %.2f)" % ("* " if answer else "  ", word, bits, 2 * error))
@@ -0,0 +1,118 @@
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+from model.instrumentation import count
+
+# Bump whenever strategies change what they choose, so older choices are not reused
+VERSION = 1
+# Entries kept in memory by each process
+CAPACITY = 1 << 14
+# Entries kept on disk, the least recently used ones being evicted past it
+MAX_ROWS = 1 << 20
+# Entries written between checks of how many there are on disk
+EVICT_EVERY = 1 << 10
+
+Key = Tuple[str, str, str]
+
+
+def get_memo_file() -> str:
+    return os.path.join(tempfile.gettempdir(), "slytherin-memo.v%d.sqlite" % VERSION)
+
+
+class GuessMemo:
+    """
+    What was worked out in a state of a game (such as the guess a strategy
+    chose), by game, kind (such as the strategy) and state, so states that
+    come back game after game (the same opener, then the same feedback) are
+    only worked out once. Values are anything JSON can hold.
+
+    The most recently used entries stay in memory, up to capacity of them.
+    With a path, every entry is also kept in a SQLite database there, shared
+    by every process and run, which keeps the max_rows most recently used.
+    Pickling a memo (to hand it to a worker) keeps only its settings: the
+    database is opened again where it is unpickled.
+    """
+
+    def __init__(self, path: Optional[str] = None, capacity: int = CAPACITY, max_rows: int = MAX_ROWS):
+        self.path = path
+        self.capacity = capacity
+        self.max_rows = max_rows
+        self.__entries: 'OrderedDict[Key, Any]' = OrderedDict()
+        self.__written = 0
+        self.__db = self.__open() if path else None
+
+    def __open(self) -> Optional[sqlite3.Connection]:
+        try:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            # A cache: losing the last few entries on a crash is fine, waiting on every write is not
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=OFF")
+            db.execute("CREATE TABLE IF NOT EXISTS memo (game TEXT, kind TEXT, state TEXT, value TEXT, "
+                       "used REAL, PRIMARY KEY (game, kind, state)) WITHOUT ROWID")
+            db.execute("CREATE INDEX IF NOT EXISTS memo_used ON memo (used)")
+        except sqlite3.Error as e:
+            logging.warning("Not remembering choices in %s: %s" % (self.path, e))
+            return None
+        self.__evict(db)
+        return db
+
+    def __getstate__(self):
+        return {"path": self.path, "capacity": self.capacity, "max_rows": self.max_rows}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def get(self, game: str, kind: str, state: str) -> Optional[Any]:
+        key = game, kind, state
+        value = self.__entries.get(key)
+        if value is not None:
+            self.__entries.move_to_end(key)
+            count("memo.hit")
+            return value
+        if self.__db is not None:
+            row = self.__db.execute("SELECT value FROM memo WHERE game = ? AND kind = ? AND state = ?", key).fetchone()
+            if row is not None:
+                self.__db.execute("UPDATE memo SET used = ? WHERE game = ? AND kind = ? AND state = ?",
+                                  (time.time(), *key))
+                value = json.loads(row[0])
+                self.__remember(key, value)
+                count("memo.hit.disk")
+                return value
+        count("memo.miss")
+        return None
+
+    def put(self, game: str, kind: str, state: str, value: Any):
+        key = game, kind, state
+        self.__remember(key, value)
+        if self.__db is not None:
+            self.__db.execute("INSERT OR REPLACE INTO memo VALUES (?, ?, ?, ?, ?)",
+                              (*key, json.dumps(value), time.time()))
+            self.__written += 1
+            if self.__written % EVICT_EVERY == 0:
+                self.__evict(self.__db)
+
+    def __remember(self, key: Key, value: Any):
+        self.__entries[key] = value
+        self.__entries.move_to_end(key)
+        if len(self.__entries) > self.capacity:
+            self.__entries.popitem(last=False)
+
+    def __evict(self, db: sqlite3.Connection):
+        rows, = db.execute("SELECT COUNT(*) FROM memo").fetchone()
+        if rows > self.max_rows:
+            db.execute("DELETE FROM memo WHERE used <= (SELECT used FROM memo ORDER BY used LIMIT 1 OFFSET ?)",
+                       (rows - self.max_rows - 1,))
+
+    def close(self):
+        if self.__db is not None:
+            self.__db.close()
+            self.__db = None
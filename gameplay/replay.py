@@ -0,0 +1,131 @@
+import collections
+import copy
+import itertools
+import json
+import logging
+import os
+from typing import Callable, Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+from model import Engine, MaskInstance, PatternSpace
+from model.space import top
+from .computer import Computer
+from .workers import main_computer, worker_computer, worker_pool
+
+# Games sent to a worker at once
+BATCH_SIZE = 64
+# Batches in flight per worker: results are written in order, so this bounds what waits in memory
+BATCHES_PER_WORKER = 4
+
+
+def analyze(computer: Computer, answer: str, guesses: List[str]) -> dict:
+    """
+    Replay a game, from the state of computer, telling for every guess how
+    it split the answers still eligible then, next to the best any word
+    could do: how many groups, how large the largest one and how many
+    answers were left on average (best_guess being the word leaving the
+    fewest). Guesses that are not words of the game are only used to prune,
+    and games with guesses the game could not score (of another length, or
+    with letters none of its words have) are not replayed.
+    """
+    if not computer.is_answer(answer):
+        return {"answer": answer, "error": "not an answer of the game"}
+    patterns = computer.patterns
+    unplayable = [guess for guess in guesses
+                  if len(guess) != patterns.length or any(c not in patterns.alphabet for c in guess)]
+    if unplayable:
+        return {"answer": answer, "error": "not %d letter guesses made of letters of the game: %s"
+                                           % (patterns.length, ", ".join(unplayable))}
+    computer = copy.copy(computer)
+    turns = []
+    solved = None
+    for turn, guess in enumerate(guesses, start=1):
+        space = PatternSpace.of(computer.solution_space)
+        metrics = space.metrics
+        analysis = {"guess": guess, "remaining": len(space.answers)}
+        i = space.index.get(guess)
+        if i is None and guess not in patterns.word_index:
+            analysis["error"] = "not a word of the game"
+        else:
+            if i is not None:
+                analysis.update(splits=int(metrics.splits[i]), largest=int(metrics.largest[i]),
+                                expected=float(metrics.expected_size[i]))
+            else:
+                # Left out of the space, which only keeps the words splitting the answers (and allowed in hard mode)
+                answer_ids = [patterns.answer_index[a] for a in space.answers.tolist()]
+                _, sizes = np.unique(patterns.row(guess)[answer_ids], return_counts=True)
+                analysis.update(splits=len(sizes), largest=int(sizes.max()),
+                                expected=float(np.square(sizes).sum() / len(answer_ids)))
+            best = top(1, -metrics.expected_size, metrics.is_answer)[0]
+            analysis.update(best_splits=int(metrics.splits.max()), best_largest=int(metrics.largest.min()),
+                            best_expected=float(metrics.expected_size[best]), best_guess=space.word_list[best])
+        turns.append(analysis)
+        mi = MaskInstance.for_answer(answer, guess)
+        if mi.mask.solved:
+            solved = turn
+            break
+        computer.update(mi)
+    return {"answer": answer, "solved": solved, "turns": turns}
+
+
+def _analyze_line(line_number: int, line: str) -> str:
+    try:
+        game = json.loads(line)
+        answer = str(game["answer"]).lower()
+        guesses = [str(guess).lower() for guess in game["guesses"]]
+        result = analyze(worker_computer(), answer, guesses)
+        if "id" in game:
+            result["id"] = game["id"]
+    except (KeyError, ValueError, TypeError) as e:
+        result = {"error": "%s: %s" % (type(e).__name__, e)}
+    result["line"] = line_number
+    return json.dumps(result)
+
+
+def _analyze_batch(batch: List[Tuple[int, str]]) -> List[str]:
+    return [_analyze_line(line_number, line) for line_number, line in batch]
+
+
+def _batches(lines: Iterable[str]) -> Iterator[List[Tuple[int, str]]]:
+    numbered = ((n, line) for n, line in enumerate(lines, start=1) if line.strip())
+    while True:
+        batch = list(itertools.islice(numbered, BATCH_SIZE))
+        if not batch:
+            return
+        yield batch
+
+
+def replay(new_engine: Callable[..., Engine], games: Iterable[str], hard_mode: bool = False,
+           workers: int = 1) -> Iterator[str]:
+    """
+    Analyze recorded games, one JSON object per line of games, with the
+    answer and the guesses played (and an optional id, which is kept),
+    such as {"answer": "cigar", "guesses": ["raise", "count", "cigar"]}.
+    Yields one JSON line per game, with what analyze tells (or an error),
+    in the order of games. Lines are read as they are needed and games are
+    spread across worker processes (0 means one per CPU), so files of any
+    size can be streamed through.
+    """
+    workers = workers or os.cpu_count() or 1
+    main_computer(new_engine(hard_mode=hard_mode), workers)
+
+    replayed = 0
+    if workers == 1:
+        for batch in _batches(games):
+            yield from _analyze_batch(batch)
+            replayed += len(batch)
+    else:
+        with worker_pool(new_engine, hard_mode, workers) as pool:
+            # Unlike pool.map, only submits batches as results are consumed
+            pending = collections.deque()
+            batches = _batches(games)
+            for batch in itertools.islice(batches, workers * BATCHES_PER_WORKER):
+                pending.append(pool.submit(_analyze_batch, batch))
+            while pending:
+                results = pending.popleft().result()
+                for batch in itertools.islice(batches, 1):
+                    pending.append(pool.submit(_analyze_batch, batch))
+                yield from results
+                replayed += len(results)
+    logging.info("Replayed %d games" % replayed)
@@ -0,0 +1,230 @@
+import asyncio
+import copy
+import itertools
+import json
+import logging
+import os
+import sys
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from model import Engine, Mask, MaskInstance
+from strategies import Strategy
+from .computer import Computer
+from .guidance import rankings
+from .workers import main_computer, worker_computer, worker_pool
+
+# Longest request line accepted
+LINE_LIMIT = 1 << 16
+# Eligible answers listed in a response, at most
+ANSWERS_SHOWN = 10
+
+
+class Session:
+    """
+    A game being played through the service: the engine pruned by the
+    feedback so far (which shares its patterns with every other session, so
+    it only holds which answers and words are left) and that feedback, as
+    (guess, mask) pairs.
+    """
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self.history: List[Tuple[str, str]] = []
+
+    def feedback(self, guess: str, mask: str):
+        length = self.engine.patterns.length
+        if len(guess) != length or len(mask) != length or any(c not in "012" for c in mask):
+            raise ValueError("expected a %d letter guess and a mask of as many 0, 1 or 2" % length)
+        self.engine = self.engine.pruned(MaskInstance(Mask([int(c) for c in mask]), guess))
+        self.history.append((guess, mask))
+
+    def remaining(self) -> dict:
+        answers = self.engine.answer_list
+        return {"remaining": len(answers), "answers": answers[:ANSWERS_SHOWN]}
+
+
+def _replayed(history: Sequence[Tuple[str, str]]) -> Computer:
+    """
+    The worker computer after the feedback of history. The space of the
+    session is narrowed once, from the one of the whole game, when asked for.
+    """
+    computer = copy.copy(worker_computer())
+    for guess, mask in history:
+        computer.update(MaskInstance(Mask([int(c) for c in mask]), guess))
+    return computer
+
+
+def _suggest_task(strategy: Strategy, history: Sequence[Tuple[str, str]]) -> str:
+    return strategy.choose(_replayed(history).solution_space)
+
+
+def _stats_task(answers: List[str], history: Sequence[Tuple[str, str]], cutoff: int) -> dict:
+    return rankings(frozenset(answers), _replayed(history).solution_space, cutoff)
+
+
+class SolverService:
+    """
+    Serves many games at once over JSON lines: every request is an object
+    with an "op" (and an "id", echoed back so responses can be told apart,
+    as they are sent when ready rather than in order):
+
+    - {"op": "new"}: starts a session, answered with its "session" id
+    - {"op": "feedback", "session", "guess", "mask"}: the mask (such as
+      "01200") the game gave to a guess, answered with the answers left
+    - {"op": "suggest", "session", "strategy"?}: the best guess, by the given
+      strategy or the default one (or the answers left, when there are none)
+    - {"op": "stats", "session", "cutoff"?}: the rankings of guidance.stats
+    - {"op": "close", "session"}: forgets the session
+
+    Failures, whatever they are, are answered with an "error". The engine and the solution
+    space stay loaded for as long as the service runs: sessions only hold
+    what they pruned from them. Suggestions and stats are computed by an
+    executor, whose workers replay the history of the session on their own
+    computer (for processes, set up with _start_worker).
+    """
+
+    def __init__(self, engine: Engine, strategies: Mapping[str, Strategy], default_strategy: str,
+                 executor: Executor):
+        self.__engine = engine
+        self.__strategies = strategies
+        self.__default_strategy = default_strategy
+        self.__executor = executor
+        self.__sessions: Dict[str, Session] = dict()
+        self.__ids = itertools.count(1)
+        # Every game starts in the same state, so each strategy chooses the first guess once
+        self.__openers: Dict[str, asyncio.Future] = dict()
+
+    def __len__(self) -> int:
+        return len(self.__sessions)
+
+    async def handle(self, line: str) -> dict:
+        request = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("requests must be JSON objects")
+            response = await self.__dispatch(request)
+        except (KeyError, ValueError, TypeError) as e:
+            response = {"error": "%s: %s" % (type(e).__name__, e)}
+        except Exception as e:
+            # Still answered, or the client would wait for it forever
+            logging.exception("Failed to answer %s" % line.strip())
+            response = {"error": "%s: %s" % (type(e).__name__, e)}
+        if isinstance(request, dict) and "id" in request:
+            response["id"] = request["id"]
+        return response
+
+    async def __dispatch(self, request: dict) -> dict:
+        op = request.get("op")
+        if op == "new":
+            session_id = str(next(self.__ids))
+            self.__sessions[session_id] = Session(self.__engine)
+            return {"session": session_id}
+        session_id = str(request["session"])
+        session = self.__sessions.get(session_id)
+        if session is None:
+            raise ValueError("no session %s" % session_id)
+        if op == "feedback":
+            session.feedback(str(request["guess"]).lower(), str(request["mask"]))
+            return session.remaining()
+        if op == "suggest":
+            return await self.__suggest(session, request.get("strategy", self.__default_strategy))
+        if op == "stats":
+            cutoff = int(request.get("cutoff", 5))
+            answers = session.engine.answer_list
+            if len(answers) <= 1:
+                return session.remaining()
+            return await self.__run(_stats_task, answers, list(session.history), cutoff)
+        if op == "close":
+            del self.__sessions[session_id]
+            return {"closed": session_id}
+        raise ValueError("unknown op %r" % op)
+
+    async def __suggest(self, session: Session, strategy_name: str) -> dict:
+        strategy = self.__strategies[strategy_name]
+        answers = session.engine.answer_list
+        if len(answers) == 0:
+            # The feedback contradicts itself (or the game was solved): there is nothing to guess
+            return session.remaining()
+        if len(answers) == 1:
+            return {"guess": answers[0]}
+        if session.history:
+            return {"guess": await self.__run(_suggest_task, strategy, list(session.history))}
+        if strategy_name not in self.__openers:
+            self.__openers[strategy_name] = asyncio.ensure_future(self.__run(_suggest_task, strategy, []))
+        return {"guess": await asyncio.shield(self.__openers[strategy_name])}
+
+    async def __run(self, task, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.__executor, task, *args)
+
+    async def serve_stream(self, reader: asyncio.StreamReader, write: Callable[[str], None]):
+        """
+        Answer every request line of reader, concurrently, until it ends
+        """
+        pending = set()
+
+        async def answer(line: str):
+            write(json.dumps(await self.handle(line)) + "\n")
+
+        while True:
+            try:
+                line = await reader.readline()
+            except ValueError:
+                write(json.dumps({"error": "request longer than %d bytes" % LINE_LIMIT}) + "\n")
+                break
+            if not line:
+                break
+            if line.strip():
+                task = asyncio.ensure_future(answer(line.decode()))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+        if pending:
+            await asyncio.wait(pending)
+
+
+async def _serve_stdio(service: SolverService):
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=LINE_LIMIT)
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+
+    def write(text: str):
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+    await service.serve_stream(reader, write)
+
+
+async def _serve_socket(service: SolverService, path: str):
+    async def client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            await service.serve_stream(reader, lambda text: writer.write(text.encode()))
+            await writer.drain()
+        finally:
+            writer.close()
+
+    server = await asyncio.start_unix_server(client, path, limit=LINE_LIMIT)
+    logging.info("Serving on %s" % path)
+    async with server:
+        await server.serve_forever()
+
+
+def serve(new_engine: Callable[..., Engine], strategies: Mapping[str, Strategy], default_strategy: str,
+          hard_mode: bool = False, workers: int = 1, socket_path: Optional[str] = None):
+    """
+    Run a SolverService on engines made by new_engine(hard_mode=...), over
+    stdin and stdout, or over a unix socket at socket_path (where sessions
+    are shared by every client). Suggestions and stats are computed by
+    worker processes, or by a thread when workers is 1 (0 means one per
+    CPU).
+    """
+    workers = workers or os.cpu_count() or 1
+    engine = new_engine(hard_mode=hard_mode)
+    main_computer(engine, workers)
+    executor = ThreadPoolExecutor(max_workers=1) if workers == 1 else worker_pool(new_engine, hard_mode, workers)
+    service = SolverService(engine, strategies, default_strategy, executor)
+    with executor:
+        try:
+            asyncio.run(_serve_socket(service, socket_path) if socket_path else _serve_stdio(service))
+        except KeyboardInterrupt:
+            pass
@@ -4,18 +4,20 @@ from model import MaskInstance
 from strategies import Strategy
 
 class SpaceSearch(Player):
-    def __init__(self, computer: Computer, strategy: Strategy, *first_words: str):
+    def __init__(self, computer: Computer, strategy: Strategy, *first_words: str, verbose: bool = True):
         self.__computer = computer
         self.__strategy = strategy
         self.__first_word = list(reversed(first_words))
+        self.__verbose = verbose
         self.log = []
 
     def provide(self) -> str:
         if self.__first_word:
             choice = self.__first_word.pop()
         else:
-            choice = self.__strategy.choose(self.__computer.solution_space)
-        print(" > %s" % choice)
+            choice = self.__computer.best_guess(self.__strategy)
+        if self.__verbose:
+            print(" > %s" % choice)
         return choice
 
     def accept(self, *mask: MaskInstance):
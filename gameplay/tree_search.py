@@ -0,0 +1,55 @@
+import logging
+from typing import Optional
+
+from model import Engine, MaskInstance
+from model.minimax import MinimaxSolver
+from model.tree import DecisionTree, TreeSolver
+from .data import fetch_tree, save_tree
+from .player import Player
+
+
+def load_tree(engine: Engine, candidates: Optional[int] = None, max_depth: Optional[int] = None,
+              workers: int = 1, minimax: bool = False) -> DecisionTree:
+    """
+    The best decision tree for the engine, solved once and then saved for its
+    game_id: the one with the fewest expected guesses or, with minimax, the
+    one with the fewest guesses in the worst case
+    """
+    game_id = engine.game_id()
+    name = ("minimax-" if minimax else "") + ("exact" if candidates is None else "c%d" % candidates) + \
+        ("-d%d" % max_depth if max_depth else "")
+    tree = fetch_tree(game_id, name)
+    if tree is None:
+        logging.info("Solving the decision tree, this can take a while...")
+        engine.patterns.build(workers)
+        if minimax:
+            tree = MinimaxSolver(engine, candidates, max_depth, workers).solve()
+        else:
+            tree = TreeSolver(engine, candidates, max_depth).solve()
+        save_tree(game_id, name, tree)
+    return tree
+
+
+class TreeSearch(Player):
+    """
+    Plays by walking a decision tree, one step per turn. Once the game
+    leaves the tree (say, because there is more than one word to solve),
+    fallback takes over. fallback is kept up to date all along.
+    """
+    def __init__(self, tree: DecisionTree, fallback: Player, verbose: bool = True):
+        self.__node = tree
+        self.__fallback = fallback
+        self.__verbose = verbose
+
+    def provide(self) -> str:
+        if self.__node is None:
+            return self.__fallback.provide()
+        choice = self.__node.guess
+        if self.__verbose:
+            print(" > %s" % choice)
+        return choice
+
+    def accept(self, *mask: MaskInstance):
+        self.__fallback.accept(*mask)
+        if self.__node is not None:
+            self.__node = self.__node.next(mask[0].mask) if len(mask) == 1 else None
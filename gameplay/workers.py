@@ -0,0 +1,50 @@
+"""
+The computers of the modes spreading games across worker processes (bench,
+replay and serve): every worker keeps the computer of the game before any
+guess, set up once for all the games it gets, which tasks copy or replay
+feedback onto.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Optional
+
+from model import Engine
+from .computer import Computer
+from .memo import GuessMemo
+
+# The computer of this worker process, set once by _start_worker (or by main_computer, for work done in-process)
+_worker_computer: Optional[Computer] = None
+
+
+def _start_worker(new_engine: Callable[..., Engine], hard_mode: bool, memo: Optional[GuessMemo]):
+    global _worker_computer
+    _worker_computer = Computer(new_engine(hard_mode=hard_mode), memo=memo)
+    # Maps the cached space once for every game of this process
+    _worker_computer.solution_space
+
+
+def main_computer(engine: Engine, workers: int, memo: Optional[GuessMemo] = None) -> Computer:
+    """
+    The computer of the main process, with its space loaded, so the cache
+    exists before workers try to load it. With a single worker, games are
+    played in this process: it is also the worker computer.
+    """
+    global _worker_computer
+    computer = Computer(engine, workers=workers, memo=memo)
+    computer.solution_space
+    if workers == 1:
+        _worker_computer = computer
+    return computer
+
+
+def worker_pool(new_engine: Callable[..., Engine], hard_mode: bool, workers: int,
+                memo: Optional[GuessMemo] = None) -> ProcessPoolExecutor:
+    """
+    Worker processes, each setting up its computer on engines made by
+    new_engine(hard_mode=...) (which must pickle, such as a class or a
+    functools.partial of it)
+    """
+    return ProcessPoolExecutor(max_workers=workers, initializer=_start_worker, initargs=(new_engine, hard_mode, memo))
+
+
+def worker_computer() -> Computer:
+    return _worker_computer
@@ -3,5 +3,9 @@ from typing import Dict, List
 
 from .masks import Mask, MaskInstance
 from .engine import Engine, MutableEngine
+from .boards import Boards
+from .constraints import Constraints, InvertedIndex
+from .patterns import PatternMatrix
+from .space import PatternSpace
 
 from .common import *
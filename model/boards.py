@@ -0,0 +1,68 @@
+import copy
+from typing import Dict, List
+
+import numpy as np
+
+from .engine import Engine
+from .masks import MaskInstance
+
+
+class Boards:
+    """
+    State of a game played on several boards at once (quordle, octordle...),
+    where every guess goes to all the boards still unsolved. Each board keeps
+    its own set of eligible answers, as a boolean mask over the answers of
+    the engine, instead of merging them all into a single set.
+
+    In hard mode, the engine is pruned as usual too, as it tells which words
+    can still be guessed.
+    """
+
+    def __init__(self, engine: Engine, n_boards: int):
+        self._engine = engine
+        eligible = np.zeros(len(engine.patterns.answers), dtype=bool)
+        eligible[engine.answer_ids] = True
+        self._eligible: List[np.ndarray] = [eligible] * n_boards
+
+    @property
+    def engine(self) -> Engine:
+        return self._engine
+
+    def __len__(self) -> int:
+        """
+        Number of boards still unsolved
+        """
+        return len(self._eligible)
+
+    def answer_ids(self) -> List[np.ndarray]:
+        """
+        Indexes (into engine.patterns.answers) of the answers still eligible on each unsolved board
+        """
+        return [np.flatnonzero(eligible) for eligible in self._eligible]
+
+    def answer_lists(self) -> List[List[str]]:
+        answers = self._engine.patterns.answers
+        return [[answers[i] for i in ids] for ids in self.answer_ids()]
+
+    def pruned(self, *mask_instances: MaskInstance) -> 'Boards':
+        """
+        Boards after a guess, given one mask per unsolved board (in order).
+        Boards whose mask is solved are done and dropped. The pattern row of
+        the guess is looked up once and shared by every board.
+        """
+        if len(mask_instances) != len(self._eligible):
+            raise ValueError("Expected %d masks, one per unsolved board, got %d"
+                             % (len(self._eligible), len(mask_instances)))
+        rows: Dict[str, np.ndarray] = dict()
+        eligible = []
+        for board, mi in zip(self._eligible, mask_instances):
+            if mi.mask.solved:
+                continue
+            if mi.cause not in rows:
+                rows[mi.cause] = self._engine.patterns.row(mi.cause)
+            eligible.append(board & (rows[mi.cause] == mi.mask.code))
+        pruned = copy.copy(self)
+        if self._engine.hard_mode:
+            pruned._engine = self._engine.pruned(*mask_instances)
+        pruned._eligible = eligible
+        return pruned
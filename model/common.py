@@ -1,13 +1,41 @@
-from typing import Dict, List
+import hashlib
+from typing import Dict, List, Mapping, Sequence, Tuple
+
+import numpy as np
 
 from .masks import Mask
 
 Grouping = Dict[Mask, List[str]]
-Space = Dict[str, Grouping]
+Space = Mapping[str, Grouping]
 
 def load_file_as_list(filename: str) -> List[str]:
     with open(filename, "r") as infile:
         return infile.read().splitlines()
 
 
+def fingerprint(words: Sequence[str], answers: Sequence[str]) -> str:
+    """
+    Identifies a game by its words and answers, whatever their order
+    """
+    bigstring: str = "\n".join(sorted(words)) + "\n".join(sorted(answers))
+    return hashlib.md5(bigstring.encode()).hexdigest()
+
+
+# Sections of the files laid out for memory mapping (caches, packed dictionaries) start at multiples of this
+ALIGNMENT = 8
+
+
+def padded(size: int) -> int:
+    return -(-size // ALIGNMENT) * ALIGNMENT
+
+
+def mapped(filename: str, dtype, offset: int, shape: Tuple[int, ...]) -> np.ndarray:
+    """
+    An array of filename, memory mapped read only (empty arrays can't be, so they are made instead)
+    """
+    if 0 in shape:
+        return np.zeros(shape, dtype=dtype)
+    return np.memmap(filename, dtype=dtype, mode="r", offset=offset, shape=shape).view(np.ndarray)
+
+
 __all__ = ['Grouping', 'Space', 'load_file_as_list']
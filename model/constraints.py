@@ -0,0 +1,165 @@
+from typing import Dict, FrozenSet, Tuple
+
+import numpy as np
+
+from .masks import MaskInstance
+
+
+class LetterIndex:
+    """
+    Letters of every word of a dictionary, laid out for bulk checks: the
+    letter id at each position (a words x letters array) and how many times
+    each letter id appears (a letter ids x words array, so the counts of a
+    letter across all words are contiguous).
+    """
+
+    def __init__(self, letters: np.ndarray, counts: np.ndarray, alphabet: Dict[str, int]):
+        self.letters = letters
+        self.counts = counts
+        self.alphabet = alphabet
+
+    def letter_id(self, ch: str) -> int:
+        return self.alphabet.get(ch, len(self.alphabet))
+
+    def __len__(self) -> int:
+        return len(self.letters)
+
+
+class Constraints:
+    """
+    What the feedback got so far tells about the answer, as plain rules:
+    letters known at some positions, letters known not to be at some
+    positions, and bounds on how many times letters appear. A word follows
+    the rules if and only if it would have produced every mask they were
+    compiled from.
+
+    Constraints are immutable: merged gives the rules of both sides at once,
+    which is how feedback accumulates turn after turn.
+    """
+
+    def __init__(self, greens: Dict[int, str] = None, forbidden: FrozenSet[Tuple[int, str]] = frozenset(),
+                 at_least: Dict[str, int] = None, at_most: Dict[str, int] = None):
+        self.greens = greens or dict()
+        self.forbidden = forbidden
+        self.at_least = at_least or dict()
+        self.at_most = at_most or dict()
+
+    @classmethod
+    def of(cls, mi: MaskInstance) -> 'Constraints':
+        """
+        Rules a single mask sets: a green letter is in place, a yellow or gray
+        one is not. Greens and yellows count the copies of a letter there are
+        at least, and a gray copy tells there are no more than that.
+        """
+        greens = dict()
+        forbidden = set()
+        found: Dict[str, int] = dict()
+        capped = set()
+        for i, (ch, color) in enumerate(zip(mi.cause, mi.mask)):
+            if color == 2:
+                greens[i] = ch
+            else:
+                forbidden.add((i, ch))
+            if color:
+                found[ch] = found.get(ch, 0) + 1
+            else:
+                capped.add(ch)
+        return Constraints(greens, frozenset(forbidden), found, {ch: found.get(ch, 0) for ch in capped})
+
+    def merged(self, other: 'Constraints') -> 'Constraints':
+        at_least = dict(self.at_least)
+        for ch, n in other.at_least.items():
+            at_least[ch] = max(n, at_least.get(ch, 0))
+        at_most = dict(self.at_most)
+        for ch, n in other.at_most.items():
+            at_most[ch] = min(n, at_most.get(ch, n))
+        return Constraints({**self.greens, **other.greens}, self.forbidden | other.forbidden, at_least, at_most)
+
+    def allowed(self, index: LetterIndex) -> np.ndarray:
+        """
+        Which words of index follow every rule, as a boolean mask
+        """
+        allowed = np.ones(len(index), dtype=bool)
+        for i, ch in self.greens.items():
+            allowed &= index.letters[:, i] == index.letter_id(ch)
+        for i, ch in self.forbidden:
+            allowed &= index.letters[:, i] != index.letter_id(ch)
+        for ch, n in self.at_least.items():
+            allowed &= index.counts[index.letter_id(ch)] >= n
+        for ch, n in self.at_most.items():
+            allowed &= index.counts[index.letter_id(ch)] <= n
+        return allowed
+
+    def __str__(self):
+        return "greens: %s, not at: %s, at least: %s, at most: %s" % (
+            self.greens, sorted(self.forbidden), self.at_least, self.at_most)
+
+
+def is_canonical(mi: MaskInstance) -> bool:
+    """
+    Whether some answer could give this mask. Copies of a letter that are not
+    green get yellows first, from left to right, so a yellow can never come
+    after a gray copy of the same letter.
+    """
+    grayed = set()
+    for ch, color in zip(mi.cause, mi.mask):
+        if color == 0:
+            grayed.add(ch)
+        elif color == 1 and ch in grayed:
+            return False
+    return True
+
+
+class InvertedIndex:
+    """
+    The answers having each letter at each position, and the answers having
+    at least n copies of each letter, as bitsets (numpy packed bits, one bit
+    per answer). Constraints are resolved with a few bitwise operations
+    over them, rather than by looking at answers one by one.
+    """
+
+    def __init__(self, letters: np.ndarray, counts: np.ndarray, alphabet: Dict[str, int]):
+        """
+        letters and counts are the tables of the answers, as in LetterIndex
+        """
+        n_answers, length = letters.shape
+        self.alphabet = alphabet
+        self.length = length
+        self.size = n_answers
+        ids = np.arange(counts.shape[0])
+        # at[i, letter]: answers with letter at position i
+        self.at = np.packbits(letters.T[:, None, :] == ids[None, :, None], axis=-1, bitorder="little")
+        # at_least[letter, n]: answers with at least n copies of letter
+        self.at_least = np.packbits(counts[:, None, :] >= np.arange(length + 1)[None, :, None], axis=-1,
+                                    bitorder="little")
+
+    def letter_id(self, ch: str) -> int:
+        return self.alphabet.get(ch, len(self.alphabet))
+
+    def matching(self, constraints: Constraints) -> np.ndarray:
+        """
+        Which answers follow the constraints, as a boolean mask
+        """
+        bits = np.full(self.at.shape[-1], 0xFF, dtype=np.uint8)
+        for i, ch in constraints.greens.items():
+            bits &= self.at[i, self.letter_id(ch)]
+        for i, ch in constraints.forbidden:
+            bits &= ~self.at[i, self.letter_id(ch)]
+        for ch, n in constraints.at_least.items():
+            if n > self.length:
+                bits[:] = 0
+            else:
+                bits &= self.at_least[self.letter_id(ch), n]
+        for ch, n in constraints.at_most.items():
+            if n < self.length:
+                bits &= ~self.at_least[self.letter_id(ch), n + 1]
+        return np.unpackbits(bits, count=self.size, bitorder="little").astype(bool)
+
+    def answers_for(self, mi: MaskInstance) -> np.ndarray:
+        """
+        Which answers would give this mask to its guess, as a boolean mask
+        (none of them, for masks no answer can give)
+        """
+        if not is_canonical(mi):
+            return np.zeros(self.size, dtype=bool)
+        return self.matching(Constraints.of(mi))
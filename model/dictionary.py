@@ -0,0 +1,115 @@
+import os
+import struct
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .common import fingerprint, mapped, padded
+from .patterns import build_alphabet, encode_words, letter_counts
+
+# Packed dictionary layout, all little endian:
+#   header:     magic, format version, letters per word, words, answers,
+#               strings, letters in the alphabet, fingerprint (md5 digest)
+#   alphabet:   letters UCS4 characters, in letter id order
+#   strings:    strings x letters UCS4 characters, the words first and then
+#               the answers that are not words
+#   answer ids: answers uint32 indexes into strings
+#   letters:    strings x letters uint8 letter ids
+#   counts:     (alphabet + 1) x strings uint8, times each letter id appears
+MAGIC = b"SLYTDIC\0"
+VERSION = 1
+HEADER = struct.Struct("<8sIIIIII16s")
+
+
+def _sections(length: int, n_answers: int, n_strings: int, n_letters: int):
+    alphabet_at = padded(HEADER.size)
+    strings_at = padded(alphabet_at + 4 * n_letters)
+    answers_at = padded(strings_at + 4 * length * n_strings)
+    letters_at = padded(answers_at + 4 * n_answers)
+    counts_at = padded(letters_at + length * n_strings)
+    return alphabet_at, strings_at, answers_at, letters_at, counts_at, counts_at + (n_letters + 1) * n_strings
+
+
+class PackedDictionary:
+    """
+    Words and answers of a game, with the letter tables PatternMatrix needs,
+    read from a file written by write_dictionary. Every array is memory
+    mapped, so loading is little more than opening the file.
+    """
+
+    def __init__(self, strings: np.ndarray, n_words: int, answer_ids: np.ndarray, alphabet: Dict[str, int],
+                 letters: np.ndarray, counts: np.ndarray, fingerprint: str):
+        self.strings = strings
+        self.n_words = n_words
+        self.answer_ids = answer_ids
+        self.alphabet = alphabet
+        self.letters = letters
+        self.counts = counts
+        self.fingerprint = fingerprint
+
+    @property
+    def word_array(self) -> np.ndarray:
+        return self.strings[:self.n_words]
+
+    @property
+    def answer_array(self) -> np.ndarray:
+        return self.strings[self.answer_ids]
+
+    @classmethod
+    def load(cls, filename: str) -> 'PackedDictionary':
+        """
+        Raises ValueError if filename is not a valid packed dictionary
+        """
+        with open(filename, "rb") as infile:
+            header = infile.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise ValueError("truncated header")
+        magic, version, length, n_words, n_answers, n_strings, n_letters, digest = HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a version %d packed dictionary" % VERSION)
+        alphabet_at, strings_at, answers_at, letters_at, counts_at, end = \
+            _sections(length, n_answers, n_strings, n_letters)
+        if os.path.getsize(filename) != end:
+            raise ValueError("expected %d bytes, found %d" % (end, os.path.getsize(filename)))
+
+        alphabet = mapped(filename, "<U1", alphabet_at, (n_letters,)).tolist()
+        return PackedDictionary(mapped(filename, "<U%d" % max(length, 1), strings_at, (n_strings,)), n_words,
+                                mapped(filename, "<u4", answers_at, (n_answers,)),
+                                {ch: i for i, ch in enumerate(alphabet)},
+                                mapped(filename, np.uint8, letters_at, (n_strings, length)),
+                                mapped(filename, np.uint8, counts_at, (n_letters + 1, n_strings)),
+                                digest.hex())
+
+
+def write_dictionary(outfile, words: List[str], answers: List[str], length: Optional[int] = None):
+    """
+    Pack words and answers (in their order) into outfile, along with their
+    letter tables and fingerprint
+    """
+    length = length if length is not None else len(answers[0]) if answers else len(words[0]) if words else 0
+    alphabet = build_alphabet(words, answers)
+    if len(alphabet) >= 255:
+        raise ValueError("%d letters do not fit in a packed dictionary" % len(alphabet))
+    strings = list(words)
+    index = {w: i for i, w in enumerate(words)}
+    answer_ids = []
+    for answer in answers:
+        if answer not in index:
+            index[answer] = len(strings)
+            strings.append(answer)
+        answer_ids.append(index[answer])
+    letters = encode_words(strings, length, alphabet).astype(np.uint8)
+    counts = letter_counts(letters, len(alphabet) + 1)
+    n_letters, n_strings = len(alphabet), len(strings)
+    alphabet_at, strings_at, answers_at, letters_at, counts_at, _ = \
+        _sections(length, len(answers), n_strings, n_letters)
+
+    outfile.write(HEADER.pack(MAGIC, VERSION, length, len(words), len(answers), n_strings, n_letters,
+                              bytes.fromhex(fingerprint(words, answers))))
+    for offset, data in [(alphabet_at, np.array(sorted(alphabet, key=alphabet.get), dtype="<U1")),
+                         (strings_at, np.array(strings, dtype="<U%d" % max(length, 1))),
+                         (answers_at, np.array(answer_ids, dtype="<u4")),
+                         (letters_at, letters),
+                         (counts_at, counts)]:
+        outfile.write(b"\0" * (offset - outfile.tell()))
+        outfile.write(np.ascontiguousarray(data).tobytes())
@@ -1,71 +1,223 @@
 import copy
 import hashlib
 import logging
+from typing import FrozenSet, List
+
+import numpy as np
 
 from .common import load_file_as_list, Grouping
+from .constraints import Constraints
+from .dictionary import PackedDictionary
+from .instrumentation import timed
 from .masks import MaskInstance
+from .patterns import PatternMatrix
 
 
 class Engine:
+    """
+    State of a game: which answers are still eligible and which words can
+    still be guessed. Both are kept as boolean masks over the tables of
+    patterns (and as the index arrays of what is set in them), so pruning is
+    a matter of bitwise operations. Strings are only built when asked for.
+    """
+
     def __init__(self, answers_file: str, words_file: str, hard_mode: bool = False):
-        self._answers = load_file_as_list(answers_file)
-        self._words = load_file_as_list(words_file)
+        answers = load_file_as_list(answers_file)
+        words = load_file_as_list(words_file)
+        self._start(PatternMatrix(words, answers), hard_mode)
+
+    @classmethod
+    def load(cls, packed_file: str, hard_mode: bool = False):
+        """
+        Start a game from a packed dictionary (see model.dictionary) rather
+        than from text files. Raises ValueError if the file is not one.
+        """
+        dictionary = PackedDictionary.load(packed_file)
+        engine = cls.__new__(cls)
+        engine._start(PatternMatrix(dictionary.word_array.tolist(), dictionary.answer_array.tolist(), dictionary),
+                      hard_mode)
+        return engine
+
+    def _start(self, patterns: PatternMatrix, hard_mode: bool):
         self._hard_mode = hard_mode
+        self._patterns = patterns
+        self._set_answers(np.ones(len(patterns.answers), dtype=bool))
+        self._set_words(np.ones(len(patterns.words), dtype=bool))
+        # Everything the feedback told so far, which guesses must follow in hard mode
+        self._constraints = Constraints()
 
     def is_answer(self, guess: str) -> bool:
-        return guess in self._answers
+        index = self._patterns.answer_index.get(guess)
+        return index is not None and bool(self._eligible[index])
+
+    @property
+    def hard_mode(self) -> bool:
+        return self._hard_mode
+
+    @property
+    def patterns(self) -> PatternMatrix:
+        return self._patterns
+
+    @property
+    def answer_ids(self) -> np.ndarray:
+        """
+        Indexes (into patterns.answers) of the answers still eligible
+        """
+        return self._answer_ids
+
+    @property
+    def word_ids(self) -> np.ndarray:
+        """
+        Indexes (into patterns.words) of the words that can still be guessed
+        """
+        return self._word_ids
+
+    def pattern_rows(self) -> np.ndarray:
+        """
+        Pattern codes of every word that can be guessed (one row per word_ids)
+        against every eligible answer (one column per answer_ids)
+        """
+        codes = self._patterns.codes
+        if len(self._word_ids) == codes.shape[0] and len(self._answer_ids) == codes.shape[1]:
+            return codes
+        return codes[np.ix_(self._word_ids, self._answer_ids)]
 
+    def pattern_row(self, word: str) -> np.ndarray:
+        """
+        Pattern codes of a word against every eligible answer, in answer_ids order
+        """
+        return self._patterns.row(word)[self._answer_ids]
+
+    @timed("engine.compute_grouping")
     def compute_grouping(self, word: str) -> Grouping:
-        groups = dict()
-        for answer in self._answers:
-            resp = MaskInstance.for_answer(answer, word)
-            groups.setdefault(resp.mask, [])
-            groups[resp.mask].append(answer)
-        return groups
+        return self._patterns.grouping(self.pattern_row(word), self._answer_ids)
 
+    @timed("engine.pruned")
     def pruned(self, *mask_instances: MaskInstance):
         pruned = copy.copy(self)
-        pruned_answers = self._prune_answers(mask_instances)
-        pruned._answers = pruned_answers
+        pruned._set_answers(self._prune_answers(mask_instances))
         if self._hard_mode:
-            pruned._words = [pw for pw in self._words if any(mi.matches(pw) for mi in mask_instances)]
-        else:
-            pruned._words = self._words
+            pruned._prune_words(mask_instances)
         return pruned
 
-    def _prune_answers(self, mask_instances):
-        answers = set()
-        solutions_already_found = set()
+    def matching(self, constraints: Constraints) -> List[str]:
+        """
+        Eligible answers following constraints (say, Constraints.of a mask
+        instance, or several of them merged), in the same order as answer_list
+        """
+        matching = self._eligible & self._patterns.inverted.matching(constraints)
+        return [self._patterns.answers[i] for i in np.flatnonzero(matching)]
+
+    def _prune_answers(self, mask_instances) -> np.ndarray:
+        answers = np.zeros_like(self._eligible)
+        solutions_already_found = np.zeros_like(self._eligible)
         for mi in mask_instances:
-            this_answers = self.compute_grouping(mi.cause)[mi.mask]
-            if len(this_answers) == 1 and mi.cause in this_answers:
+            this_answers = self._eligible & self._patterns.inverted.answers_for(mi)
+            cause = self._patterns.answer_index.get(mi.cause)
+            if cause is not None and this_answers[cause] and np.count_nonzero(this_answers) == 1:
                 logging.debug("Found a solution")
-                solutions_already_found.add(this_answers[0])
+                solutions_already_found |= this_answers
                 continue
-            answers = answers.union(this_answers)
-        return answers - solutions_already_found
+            answers |= this_answers
+        return answers & ~solutions_already_found
+
+    @property
+    def constraints(self) -> Constraints:
+        """
+        Rules compiled from all the feedback so far (of a single word game)
+        """
+        return self._constraints
+
+    def _prune_words(self, mask_instances):
+        """
+        Keep the words that follow the rules of every turn so far. With
+        several masks at once (several words to find), a word only needs to
+        follow one of them, on top of the words it was already allowed.
+        """
+        index = self._patterns.word_letters
+        if len(mask_instances) == 1:
+            self._constraints = self._constraints.merged(Constraints.of(mask_instances[0]))
+            self._set_words(self._allowed & self._constraints.allowed(index))
+            return
+        allowed = np.zeros_like(self._allowed)
+        for mi in mask_instances:
+            allowed |= Constraints.of(mi).allowed(index)
+        self._set_words(self._allowed & allowed)
+
+    def _set_answers(self, eligible: np.ndarray):
+        self._eligible = eligible
+        self._answer_ids = np.flatnonzero(eligible)
+        self._answers = None
+        self._answer_set = None
+        self._game_id = None
+
+    def _set_words(self, allowed: np.ndarray):
+        self._allowed = allowed
+        self._word_ids = np.flatnonzero(allowed)
+        self._words = None
+        self._word_set = None
+        self._game_id = None
 
     def game_id(self) -> str:
-        logging.debug("Calculating hash for universe")
-        bigstring: str = "\n".join(sorted(self._words)) + "\n".join(sorted(self._answers))
-        the_hash = hashlib.md5(bigstring.encode())
-        return the_hash.hexdigest()
+        """
+        The fingerprint of the dictionary, computed once for it, and for a
+        pruned engine a hash of it with the answers and words left. Like the
+        fingerprint, it is told by the strings rather than their indexes,
+        which depend on the order of the files.
+        """
+        if self._game_id is None:
+            patterns = self._patterns
+            if len(self._answer_ids) == len(patterns.answers) and len(self._word_ids) == len(patterns.words):
+                self._game_id = patterns.fingerprint
+            else:
+                logging.debug("Calculating hash for pruned universe")
+                the_hash = hashlib.md5(patterns.fingerprint.encode())
+                the_hash.update(np.sort(patterns.answer_array[self._answer_ids]).tobytes())
+                the_hash.update(b"/")
+                if len(self._word_ids) < len(patterns.words):
+                    the_hash.update(np.sort(patterns.word_array[self._word_ids]).tobytes())
+                self._game_id = the_hash.hexdigest()
+        return self._game_id
+
+    @property
+    def words(self) -> FrozenSet[str]:
+        if self._word_set is None:
+            self._word_set = frozenset(self.word_list)
+        return self._word_set
+
+    @property
+    def eligible_answers(self) -> FrozenSet[str]:
+        if self._answer_set is None:
+            self._answer_set = frozenset(self.answer_list)
+        return self._answer_set
 
     @property
-    def words(self):
-        return set(self._words)
+    def answer_list(self) -> List[str]:
+        """
+        Eligible answers, in the same order as answer_ids
+        """
+        if self._answers is None:
+            self._answers = [self._patterns.answers[i] for i in self._answer_ids]
+        return self._answers
 
     @property
-    def eligible_answers(self):
-        return set(self._answers)
+    def word_list(self) -> List[str]:
+        """
+        Words that can be guessed, in the same order as word_ids
+        """
+        if self._words is None:
+            self._words = [self._patterns.words[i] for i in self._word_ids]
+        return self._words
 
     def acceptable_guess(self, guess: str) -> bool:
-        return guess in self._words
+        index = self._patterns.word_index.get(guess)
+        return index is not None and bool(self._allowed[index])
 
 
 class MutableEngine(Engine):
+    @timed("engine.pruned")
     def pruned(self, *mask_instances: MaskInstance):
-        self._answers = self._prune_answers(mask_instances)
+        self._set_answers(self._prune_answers(mask_instances))
         if self._hard_mode:
-            self._words = [pw for pw in self._words if any(mi.matches(pw) for mi in mask_instances)]
+            self._prune_words(mask_instances)
         return self
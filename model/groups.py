@@ -0,0 +1,98 @@
+from typing import Dict, Iterator, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+from .masks import Mask
+
+
+class Group(Sequence):
+    """
+    The answers of a group, as a read only list of names. Only its size is
+    known upfront: names are looked up one by one when indexed, and all at
+    once the first time the whole group is read.
+    """
+
+    def __init__(self, members: np.ndarray, names: Optional[np.ndarray] = None):
+        self._members = members
+        self._names = names
+        self._list: Optional[List[str]] = None
+
+    def __len__(self) -> int:
+        return len(self._members)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return self._as_list()[i]
+        if self._list is not None:
+            return self._list[i]
+        member = self._members[i]
+        return str(member if self._names is None else self._names[member])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._as_list())
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Group):
+            other = other._as_list()
+        return self._as_list() == other
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return repr(self._as_list())
+
+    def _as_list(self) -> List[str]:
+        if self._list is None:
+            names = self._members if self._names is None else self._names[self._members]
+            self._list = names.tolist()
+        return self._list
+
+
+class LazyGrouping(Mapping):
+    """
+    A Grouping read from a Partition: masks and group sizes come straight
+    from its offset arrays, and each group is a Group whose answer names are
+    only built when read.
+
+    names maps the members of the partition (answer indexes) to answer
+    names. Without it, members are the names.
+    """
+
+    def __init__(self, partition, length: int, names: Optional[np.ndarray] = None):
+        self._partition = partition
+        self._length = length
+        self._names = names
+        self._masks: Optional[List[Mask]] = None
+        self._index: Optional[Dict[Mask, int]] = None
+
+    @property
+    def masks(self) -> List[Mask]:
+        if self._masks is None:
+            self._masks = [Mask.of(int(code), self._length) for code in self._partition.codes]
+        return self._masks
+
+    def size(self, mask: Mask) -> int:
+        """
+        Number of answers getting mask, without looking at them
+        """
+        return int(self._partition.sizes[self._group_of(mask)])
+
+    def sizes(self) -> List[int]:
+        return self._partition.sizes.tolist()
+
+    def _group_of(self, mask: Mask) -> int:
+        if self._index is None:
+            self._index = {m: g for g, m in enumerate(self.masks)}
+        return self._index[mask]
+
+    def __getitem__(self, mask: Mask) -> Group:
+        return Group(self._partition.group(self._group_of(mask)), self._names)
+
+    def __iter__(self) -> Iterator[Mask]:
+        return iter(self.masks)
+
+    def __len__(self) -> int:
+        return len(self._partition)
+
+    def __repr__(self) -> str:
+        return repr(dict(self.items()))
@@ -0,0 +1,131 @@
+import atexit
+import json
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from functools import wraps
+from typing import Dict, List, Optional
+
+
+class Profile:
+    """
+    Counters and timers collected over a run, along with what each game
+    turn added to them and the most memory it held at once (as traced by
+    tracemalloc, which numpy arrays report to).
+    """
+
+    def __init__(self, **details):
+        self.details = details
+        self.start = time.perf_counter()
+        self.counters = Counter()
+        # Calls, total and longest time, by timer
+        self.timers: Dict[str, List[float]] = dict()
+        self.turns: List[dict] = []
+        self.__turn_start = self.start
+        self.__turn_counters = Counter()
+        self.__turn_timers: Dict[str, List[float]] = dict()
+
+    def time(self, name: str, elapsed: float):
+        for timers in (self.timers, self.__turn_timers):
+            timer = timers.setdefault(name, [0, 0.0, 0.0])
+            timer[0] += 1
+            timer[1] += elapsed
+            timer[2] = max(timer[2], elapsed)
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] += n
+        self.__turn_counters[name] += n
+
+    def end_turn(self, **details):
+        now = time.perf_counter()
+        _, peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, None)
+        self.turns.append({**details, "turn": len(self.turns) + 1, "elapsed": now - self.__turn_start,
+                           "peak_traced_bytes": peak, "counters": dict(self.__turn_counters),
+                           "timers": _timers_report(self.__turn_timers)})
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        self.__turn_start = now
+        self.__turn_counters = Counter()
+        self.__turn_timers = dict()
+
+    def report(self) -> dict:
+        _, peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, None)
+        return {**self.details, "elapsed": time.perf_counter() - self.start, "peak_rss_kb": _peak_rss_kb(),
+                "peak_traced_bytes": peak, "counters": dict(self.counters), "timers": _timers_report(self.timers),
+                "turns": self.turns}
+
+
+def _timers_report(timers: Dict[str, List[float]]) -> dict:
+    return {name: {"calls": calls, "total": total, "max": longest} for name, (calls, total, longest) in timers.items()}
+
+
+def _peak_rss_kb() -> Optional[int]:
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+# The profile of this process, when enabled: everything below is a no-op otherwise
+_profile: Optional[Profile] = None
+
+
+def enable(report_to: str = "-", **details):
+    """
+    Start profiling this process, writing the report as JSON to report_to
+    (- for stderr) when it exits. details are added to the report as they are.
+    Worker processes are not profiled.
+    """
+    global _profile
+    _profile = Profile(**details)
+    tracemalloc.start()
+    atexit.register(_write_report, report_to)
+
+
+def enabled() -> bool:
+    return _profile is not None
+
+
+def _write_report(report_to: str):
+    report = json.dumps(_profile.report(), indent=2)
+    if report_to == "-":
+        print(report, file=sys.stderr)
+    else:
+        with open(report_to, "w") as outfile:
+            outfile.write(report)
+
+
+def timed(name: str):
+    """
+    Decorate a function to time its calls under name, when profiling
+    """
+    def decorate(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            if _profile is None:
+                return f(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return f(*args, **kwargs)
+            finally:
+                _profile.time(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def count(name: str, n: int = 1):
+    if _profile is not None:
+        _profile.count(name, n)
+
+
+def end_turn(**details):
+    """
+    Close the current game turn of the profile (if any), keeping details
+    (such as the guess) along with what it took
+    """
+    if _profile is not None:
+        _profile.end_turn(**details)
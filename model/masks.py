@@ -1,59 +1,97 @@
-from typing import List
+from typing import Sequence
+
+
+# 3 ** i and 2 * 3 ** i: what a yellow and a green letter at position i add to a pattern code
+_YELLOW = [3 ** i for i in range(41)]
+_GREEN = [2 * 3 ** i for i in range(41)]
+
+
+def pattern_code(answer: str, guess: str) -> int:
+    """
+    Pattern code of Mask.for_answer(answer, guess), computed without building the mask
+    """
+    code = 0
+    bucket = dict()
+    for i, ch in enumerate(answer):
+        if guess[i] == ch:
+            code += _GREEN[i]
+        else:
+            bucket[ch] = bucket.get(ch, 0) + 1
+    if bucket:
+        for i, ch in enumerate(guess):
+            if bucket.get(ch) and answer[i] != ch:
+                code += _YELLOW[i]
+                bucket[ch] -= 1
+    return code
 
 
 class Mask:
+    """
+    The colors a guess got: 0 (gray), 1 (yellow) or 2 (green) for each letter.
+
+    Masks are immutable and interned: there is a single Mask for each pattern
+    code (the base 3 number whose least significant digit is the first
+    letter), and that code is also its hash.
+    """
+    __slots__ = ("code", "length", "mask", "_text", "_solved")
     convert = '_?X'
+    _interned = dict()
 
-    def __init__(self, mask: List[int]):
-        self.mask = mask
+    def __new__(cls, mask: Sequence[int]):
+        code = 0
+        for i in reversed(mask):
+            code = code * 3 + i
+        return cls.of(code, len(mask))
+
+    @classmethod
+    def of(cls, code: int, length: int) -> 'Mask':
+        """
+        The Mask with this pattern code
+        """
+        interned = cls._interned.get((code, length))
+        if interned is None:
+            interned = object.__new__(cls)
+            digits = tuple((code // 3 ** i) % 3 for i in range(length))
+            object.__setattr__(interned, "code", code)
+            object.__setattr__(interned, "length", length)
+            object.__setattr__(interned, "mask", digits)
+            object.__setattr__(interned, "_text", "".join(cls.convert[i] for i in digits))
+            object.__setattr__(interned, "_solved", code == 3 ** length - 1)
+            interned = cls._interned.setdefault((code, length), interned)
+        return interned
+
+    def __setattr__(self, key, value):
+        raise AttributeError("Mask is immutable")
+
+    def __reduce__(self):
+        return Mask.of, (self.code, self.length)
 
     def __hash__(self):
-        val = 0
-        for i in self.mask[::-1]:
-            val *= 3
-            val += i
-        return val
+        return self.code
 
     def __getitem__(self, item):
         return self.mask.__getitem__(item)
 
     def __eq__(self, other):
-        return self.mask == other.mask
+        return self is other or (isinstance(other, Mask) and self.code == other.code and self.length == other.length)
 
     def __repr__(self):
-        return "".join(self.convert[i] for i in self.mask)
+        return self._text
 
     def __str__(self):
-        return "".join(self.convert[i] for i in self.mask)
+        return self._text
 
     @property
     def solved(self):
-        return all(p == 2 for p in self.mask)
+        return self._solved
 
     @classmethod
     def for_answer(cls, answer: str, guess: str):
-        n = len(answer)
-        resp = [0 for i in range(n)]
-        bucket = list(answer)
-        for i in range(0, n):
-            if guess[i] == answer[i]:
-                resp[i] = 2
-                bucket.remove(answer[i])
-        for i in range(0, n):
-            if resp[i] < 2 and guess[i] in bucket:
-                resp[i] = 1
-                bucket.remove(guess[i])
-        return Mask(resp)
+        return cls.of(pattern_code(answer, guess), len(answer))
 
     @classmethod
     def numbered(cls, p, l=5):
-        n: int = int(p)
-        def base(val, c):
-            while (c > 0):
-                yield val % 3
-                val //= 3
-                c -= 1
-        return Mask(list(base(n, l)))
+        return cls.of(int(p), l)
 
 
 class MaskInstance:
@@ -0,0 +1,276 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from . import instrumentation
+from .engine import Engine
+from .masks import Mask
+from .patterns import CHUNK_CELLS, Partition
+from .tree import DecisionTree
+
+# Bounds of a state in the transposition table: fewest guesses it may take
+# in the worst case, most it is known to take, and the guess that does it
+Bounds = Tuple[int, float, Optional[int]]
+
+
+def split_sizes(columns: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Number of groups every word splits the answers into, and how many
+    answers the largest of them holds, out of an (answers x words) array of
+    pattern codes.
+    """
+    n, n_words = columns.shape
+    groups = np.empty(n_words, dtype=int)
+    largest = np.empty(n_words, dtype=int)
+    rows = np.arange(n, dtype=np.min_scalar_type(n))[:, np.newaxis]
+    step = max(1, CHUNK_CELLS // n)
+    for start in range(0, n_words, step):
+        ordered = np.sort(columns[:, start:start + step], axis=0)
+        firsts = np.ones(ordered.shape, dtype=bool)
+        np.not_equal(ordered[1:], ordered[:-1], out=firsts[1:])
+        # Where the group of every sorted code starts, so its offset in there is how large it got
+        starts = np.maximum.accumulate(np.where(firsts, rows, 0), axis=0)
+        groups[start:start + step] = np.count_nonzero(firsts, axis=0)
+        largest[start:start + step] = (rows - starts).max(axis=0) + 1
+    return groups, largest
+
+
+def perfect_splits(columns: np.ndarray) -> np.ndarray:
+    """
+    Words giving every answer a pattern of its own, out of an (answers x
+    words) array of pattern codes. Answers are added one at a time, dropping
+    the words that give them a pattern already seen, so few words are left
+    to check against most of them.
+    """
+    words = np.arange(columns.shape[1])
+    for j in range(1, len(columns)):
+        distinct = np.all(columns[:j] != columns[j], axis=0)
+        if not distinct.all():
+            words, columns = words[distinct], columns[:, distinct]
+            if len(words) == 0:
+                break
+    return words
+
+
+def adversarial_mask(engine: Engine, guess: str) -> Mask:
+    """
+    The mask an adversary answers guess with, like Absurdle does: the one
+    keeping the most answers eligible and, between those, the hardest to
+    split (by the largest group the best next guess can leave)
+    """
+    grouping = engine.compute_grouping(guess)
+    most = max(len(group) for group in grouping.values())
+    tied = [mask for mask, group in grouping.items() if len(group) == most]
+    if len(tied) == 1:
+        return tied[0]
+    patterns = engine.patterns
+
+    def hardness(mask: Mask) -> Tuple[int, bool]:
+        answer_ids = [patterns.answer_index[answer] for answer in grouping[mask]]
+        # Only the block of the group, rather than a copy of every word against every answer
+        _, largest = split_sizes(np.ascontiguousarray(patterns.codes[np.ix_(engine.word_ids, answer_ids)].T))
+        return int(largest.min()), not mask.solved
+    return max(tied, key=hardness)
+
+
+class MinimaxSolver:
+    """
+    Finds the decision tree that solves every eligible answer of an engine
+    with the fewest guesses in the worst case, that is against an adversary
+    choosing the feedback of every guess. The tree it finds proves how many
+    guesses the game needs.
+
+    The search deepens iteratively: it looks for a tree solving everything
+    within 2 guesses, then 3 and so on. Guesses are tried by increasing
+    largest group and each one is dropped as soon as one of its groups needs
+    as many guesses as the best guess found so far (alpha-beta pruning, as
+    there is only one adversary move to refute a guess). The transposition
+    table keeps the bounds of every state, by its sorted answer indexes,
+    across depths. Guesses of the first turn are spread across workers.
+
+    The search is exact when candidates is None. Otherwise only the
+    candidates most promising guesses (by largest group) of each state are
+    tried: the tree found is still a proof that the game takes no more
+    guesses, but not that it cannot take fewer.
+    """
+
+    def __init__(self, engine: Engine, candidates: Optional[int] = None, max_depth: Optional[int] = None,
+                 workers: int = 1):
+        patterns = engine.patterns
+        self._words = [patterns.words[i] for i in engine.word_ids]
+        self._answers = patterns.answers
+        # Answers by words, so the columns of a subset of answers are contiguous
+        self._columns = np.ascontiguousarray(patterns.codes[engine.word_ids].T)
+        self._answer_of_word = np.array([patterns.answer_index.get(w, -1) for w in self._words], dtype=int)
+        self._subset = np.sort(engine.answer_ids).astype(np.min_scalar_type(len(self._answers)))
+        self._length = patterns.length
+        self._solved = 3 ** patterns.length - 1
+        self._candidates = candidates
+        self._max_depth = max_depth
+        self._workers = workers or os.cpu_count() or 1
+        self._table: Dict[bytes, Bounds] = dict()
+
+    def solve(self) -> DecisionTree:
+        global _worker_solver
+        limit = self._max_depth or len(self._subset)
+        if len(self._subset) == 1:
+            return DecisionTree(self._answers[self._subset[0]])
+        guesses = list(self._guesses(self._subset))
+        if self._workers == 1:
+            _worker_solver = self
+            return self._deepen(guesses, limit, None)
+        with ProcessPoolExecutor(max_workers=self._workers, initializer=_start_worker, initargs=(self,)) as pool:
+            try:
+                return self._deepen(guesses, limit, pool)
+            finally:
+                pool.shutdown(cancel_futures=True)
+
+    def _deepen(self, guesses: List[Tuple[int, int, List[np.ndarray]]], limit: int,
+                pool: Optional[ProcessPoolExecutor]) -> DecisionTree:
+        for depth in range(min(lower for _, lower, _ in guesses), limit + 1):
+            tried = [(guess, buckets) for guess, lower, buckets in guesses if lower <= depth]
+            if pool is None:
+                attempts = (_attempt_task(guess, buckets, depth) for guess, buckets in tried)
+            else:
+                futures = [pool.submit(_attempt_task, guess, buckets, depth) for guess, buckets in tried]
+                # In order, so the tree found does not depend on which worker finishes first
+                attempts = (future.result() for future in futures)
+            for tree in attempts:
+                if tree is not None:
+                    logging.info("Every answer is solved within %d guesses, starting with %s%s"
+                                 % (depth, tree.guess.upper(),
+                                    "" if self._candidates is None else
+                                    " (among the %d best guesses of each state)" % self._candidates))
+                    return tree
+            logging.info("No tree solves every answer within %d guesses%s"
+                         % (depth, "" if self._candidates is None else
+                            " among the %d best guesses of each state" % self._candidates))
+        raise ValueError("There is no tree solving every answer within %d guesses" % limit)
+
+    def _attempt(self, guess: int, buckets: List[np.ndarray], depth: int) -> Optional[DecisionTree]:
+        """
+        The tree solving every answer within depth guesses starting with
+        guess (whose buckets are the answers left by each mask), if any
+        """
+        if self._worst_case(buckets, depth + 1) > depth:
+            return None
+        return self._node(guess, self._subset)
+
+    def _depth(self, subset: np.ndarray, beta: int) -> int:
+        """
+        Guesses the best tree for subset takes in the worst case, when below
+        beta. Otherwise returns a lower bound that is at least beta.
+        """
+        if len(subset) == 1:
+            return 1
+        key = subset.tobytes()
+        lower, upper, known_guess = self._table.get(key, (2, np.inf, None))
+        if lower >= beta or lower == upper:
+            return lower
+        instrumentation.count("minimax.states")
+        if beta <= 3:
+            # Only whether a guess leaves single answers matters, which takes no split
+            perfect = perfect_splits(self._columns[subset])
+            if len(perfect) == 0:
+                self._table[key] = (3, upper, known_guess)
+                return 3
+            solves = np.isin(self._answer_of_word[perfect], subset)
+            self._table[key] = (2, 2, int(perfect[np.argmax(solves)]))
+            return 2
+
+        best, best_guess = min(beta, upper), None
+        for guess, guess_lower, buckets in self._guesses(subset):
+            if guess_lower >= best:
+                break
+            worst = self._worst_case(buckets, best)
+            if worst < best:
+                best, best_guess = worst, guess
+                if best <= lower:
+                    break
+
+        # Every guess (but the ones that could not do better) was tried below best
+        if best_guess is not None:
+            self._table[key] = (best, best, best_guess)
+            return best
+        if upper < beta:
+            self._table[key] = (int(upper), upper, known_guess)
+            return int(upper)
+        self._table[key] = (beta, upper, known_guess)
+        return beta
+
+    def _worst_case(self, buckets: List[np.ndarray], beta: int) -> int:
+        """
+        Guesses taken in the worst case by a guess leaving these buckets,
+        when below beta. Otherwise returns a lower bound that is at least beta.
+        """
+        worst = 2
+        # Largest first, as they are the likeliest to refute the guess
+        for bucket in buckets:
+            worst = max(worst, 1 + self._depth(bucket, beta - 1))
+            if worst >= beta:
+                break
+        return worst
+
+    def _split(self, row: np.ndarray, subset: np.ndarray) -> List[Tuple[int, np.ndarray]]:
+        """
+        Answers of subset grouped by pattern, leaving out the solved one
+        """
+        partition = Partition(row, subset)
+        return [(int(code), partition.group(g)) for g, code in enumerate(partition.codes) if code != self._solved]
+
+    def _guesses(self, subset: np.ndarray) -> Iterator[Tuple[int, int, List[np.ndarray]]]:
+        """
+        Useful guesses for subset as (word, lower bound, buckets), by
+        increasing largest group, then decreasing number of groups, then
+        answers first. Leaving only single answers takes 2 guesses, anything
+        else at least 3, and at least 4 when some group is larger than the
+        most groups any word splits subset into (as no word can split that
+        group into single answers).
+        """
+        columns = self._columns[subset]
+        in_subset = np.zeros(len(self._answers) + 1, dtype=bool)
+        in_subset[subset] = True
+        solves = in_subset[self._answer_of_word]
+        n_groups, largest = split_sizes(columns)
+        lower = np.where(largest == 1, 2, np.where(largest <= n_groups.max(), 3, 4))
+        order = np.lexsort((~solves, -n_groups, largest))
+        useful = (n_groups > 1) | solves
+        order = order[useful[order]]
+
+        seen = set()
+        for guess in order:
+            buckets = sorted((bucket for _, bucket in self._split(columns[:, guess], subset)), key=len, reverse=True)
+            signature = (bool(solves[guess]), tuple(sorted(bucket.tobytes() for bucket in buckets)))
+            if signature in seen:
+                continue
+            seen.add(signature)
+            if self._candidates is not None and len(seen) > self._candidates:
+                return
+            yield int(guess), int(lower[guess]), buckets
+
+    def _node(self, guess: int, subset: np.ndarray) -> DecisionTree:
+        children = {str(Mask.of(code, self._length)): self._tree(bucket)
+                    for code, bucket in self._split(self._columns[subset, guess], subset)}
+        return DecisionTree(self._words[guess], children, self._answer_of_word[guess] in subset)
+
+    def _tree(self, subset: np.ndarray) -> DecisionTree:
+        if len(subset) == 1:
+            return DecisionTree(self._answers[subset[0]])
+        guess = self._table[subset.tobytes()][2]
+        return self._node(guess, subset)
+
+
+# State of a worker process, set once by _start_worker
+_worker_solver: Optional[MinimaxSolver] = None
+
+
+def _start_worker(solver: MinimaxSolver):
+    global _worker_solver
+    _worker_solver = solver
+
+
+def _attempt_task(guess: int, buckets: List[np.ndarray], depth: int) -> Optional[DecisionTree]:
+    return _worker_solver._attempt(guess, buckets, depth)
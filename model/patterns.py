@@ -0,0 +1,395 @@
+import logging
+import os
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .common import Grouping, fingerprint
+from .constraints import InvertedIndex, LetterIndex
+from .groups import LazyGrouping
+
+# Number of guesses scored against every answer in a single numpy pass.
+# Bounds the size of the (guesses x answers x letters) temporaries.
+CHUNK_SIZE = 256
+# ... along with this many cells of those temporaries, for many answers or long words
+CHUNK_CELLS = 1 << 22
+# Longest words whose pattern codes fit in 64 bits
+MAX_LENGTH = 40
+# Up to this many patterns, group sizes are counted for every one of them (see pattern_counts)
+DENSE_PATTERNS = 3 ** 7
+# Number of guesses handed to a worker process at a time by PatternMatrix.build
+TASK_SIZE = 4 * CHUNK_SIZE
+
+
+def pattern_dtype(length: int) -> np.dtype:
+    """
+    Smallest unsigned integer type able to hold every pattern code of a word
+    with this many letters (uint8 for the usual 5 letters, uint16 up to 10
+    letters, uint32 up to 20).
+    """
+    if length > MAX_LENGTH:
+        raise ValueError("words of %d letters are longer than the %d supported" % (length, MAX_LENGTH))
+    return np.min_scalar_type(3 ** length - 1)
+
+
+def chunk_rows(cells_per_row: int) -> int:
+    """
+    Rows processed at once, for rows whose temporaries take this many cells
+    """
+    return max(1, min(CHUNK_SIZE, CHUNK_CELLS // max(cells_per_row, 1)))
+
+
+def build_alphabet(*word_lists: Sequence[str]) -> Dict[str, int]:
+    """
+    Give every letter used by the words a small integer id
+    """
+    letters = sorted(set(ch for words in word_lists for word in words for ch in word))
+    return {ch: i for i, ch in enumerate(letters)}
+
+
+def encode_words(words: Sequence[str], length: int, alphabet: Dict[str, int]) -> np.ndarray:
+    """
+    Turn a list of words into a (words x letters) array of letter ids.
+    Letters outside the alphabet all get the id len(alphabet).
+    """
+    unknown = len(alphabet)
+    encoded = np.zeros((len(words), length), dtype=np.min_scalar_type(unknown))
+    for i, word in enumerate(words):
+        encoded[i] = [alphabet.get(ch, unknown) for ch in word]
+    return encoded
+
+
+def letter_counts(answers: np.ndarray, n_letters: int) -> np.ndarray:
+    """
+    How many times each letter id appears in each answer, as a (letters x answers) array
+    """
+    counts = np.zeros((n_letters, answers.shape[0]), dtype=np.uint8)
+    columns = np.arange(answers.shape[0])
+    for j in range(answers.shape[1]):
+        np.add.at(counts, (answers[:, j], columns), 1)
+    return counts
+
+
+def feedback_codes(guesses: np.ndarray, answers: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """
+    Score every guess against every answer at once.
+
+    guesses and answers are arrays produced by encode_words, counts is
+    letter_counts(answers). The result is a (guesses x answers) array where
+    each cell holds the same value that Mask.for_answer(answer, guess).code
+    would produce.
+    """
+    n_guesses, length = guesses.shape
+    green = guesses[:, None, :] == answers[None, :, :]
+    codes = np.zeros((n_guesses, answers.shape[0]), dtype=pattern_dtype(length))
+    for i in range(length):
+        letter = guesses[:, i]
+        # Copies of this letter left in the bucket once greens are removed...
+        available = counts[letter]
+        # ... compared to how many non green copies of it come earlier in the guess
+        rank = np.zeros_like(available)
+        for j in range(length):
+            same = np.flatnonzero(guesses[:, j] == letter)
+            if len(same) == n_guesses:
+                available -= green[:, :, j]
+                if j < i:
+                    rank += ~green[:, :, j]
+            elif len(same):
+                available[same] -= green[same, :, j]
+                if j < i:
+                    rank[same] += ~green[same, :, j]
+        yellow = ~green[:, :, i] & (rank < available)
+        codes += (2 * green[:, :, i] + yellow).astype(codes.dtype) * codes.dtype.type(3 ** i)
+    return codes
+
+
+def pattern_counts(codes: np.ndarray, n_patterns: int) -> np.ndarray:
+    """
+    How many answers get each pattern, for every row of a (words x answers)
+    array of codes: a (words x n_patterns) array of group sizes, with zeros
+    for the patterns a word never gets.
+
+    With more patterns than DENSE_PATTERNS and than answers (long words),
+    most of those would be zeros: rows only hold the sizes of the groups
+    words get, in no particular order, padded with zeros. Either way the
+    last column is the size of the solved group (the answer itself), and
+    every other column the size of some group, so sizes can be summed up
+    without knowing which layout they came in.
+    """
+    n_words, n_answers = codes.shape
+    if n_patterns > max(DENSE_PATTERNS, n_answers + 1):
+        return _compact_counts(codes, n_patterns)
+    counts = np.zeros((n_words, n_patterns), dtype=np.min_scalar_type(n_answers))
+    rows = chunk_rows(max(n_answers, n_patterns))
+    offset_type = np.int32 if rows * n_patterns < 2 ** 31 else np.intp
+    offsets = (np.arange(rows, dtype=offset_type) * n_patterns)[:, None]
+    # All the rows of a chunk are counted by one bincount, each in its own range of bins
+    for start in range(0, n_words, rows):
+        chunk = codes[start:start + rows]
+        bins = chunk + offsets[:len(chunk)]
+        counts[start:start + len(chunk)] = np.bincount(bins.ravel(), minlength=len(chunk) * n_patterns) \
+            .reshape(len(chunk), n_patterns)
+    return counts
+
+
+def _compact_counts(codes: np.ndarray, n_patterns: int) -> np.ndarray:
+    n_words, n_answers = codes.shape
+    dtype = np.min_scalar_type(n_answers)
+    width = n_answers + 1
+    rows = chunk_rows(width)
+    offsets = (np.arange(rows, dtype=np.intp) * width)[:, None]
+    # Sizes of the groups of every chunk, trimmed to the most groups of a word in it, and of its solved groups
+    chunks = []
+    for start in range(0, n_words, rows):
+        ordered = np.sort(codes[start:start + rows], axis=1)
+        # Groups are numbered in each row from 0, in code order...
+        firsts = np.ones(ordered.shape, dtype=bool)
+        firsts[:, 1:] = ordered[:, 1:] != ordered[:, :-1]
+        group = np.cumsum(firsts, axis=1) - 1
+        # ... except the solved one (the last in code order), counted in the last column
+        group[ordered == n_patterns - 1] = width - 1
+        counts = np.bincount((group + offsets[:len(ordered)]).ravel(), minlength=len(ordered) * width) \
+            .reshape(len(ordered), width)
+        used = np.count_nonzero(counts[:, :-1], axis=1).max(initial=0)
+        chunks.append((counts[:, :used].astype(dtype), counts[:, -1].astype(dtype)))
+    used = max((groups.shape[1] for groups, _ in chunks), default=0)
+    sizes = np.zeros((n_words, used + 1), dtype=dtype)
+    start = 0
+    for groups, solved in chunks:
+        sizes[start:start + len(groups), :groups.shape[1]] = groups
+        sizes[start:start + len(groups), -1] = solved
+        start += len(groups)
+    return sizes
+
+
+def partition_classes(codes: np.ndarray) -> np.ndarray:
+    """
+    Class of every row of a (words x answers) array of codes: rows share a
+    class when they split the answers into the same groups, whatever the
+    patterns of those groups. Each row is relabelled canonically (every
+    answer by the first answer of its group), and identical labellings,
+    compared as raw bytes, make a class.
+    """
+    n_words, n_answers = codes.shape
+    if n_words == 0:
+        return np.zeros(0, dtype=int)
+    labels = np.empty(codes.shape, dtype=np.min_scalar_type(max(n_answers - 1, 0)))
+    positions = np.arange(n_answers)
+    rows = chunk_rows(n_answers)
+    for start in range(0, n_words, rows):
+        order = np.argsort(codes[start:start + rows], axis=1, kind="stable")
+        ordered = np.take_along_axis(codes[start:start + rows], order, axis=1)
+        firsts = np.ones(ordered.shape, dtype=bool)
+        firsts[:, 1:] = ordered[:, 1:] != ordered[:, :-1]
+        # Where the group of each sorted answer starts, and so its first answer (sorting is stable)
+        group_start = np.maximum.accumulate(np.where(firsts, positions, 0), axis=1)
+        np.put_along_axis(labels[start:start + rows], order, np.take_along_axis(order, group_start, axis=1), axis=1)
+    keys = np.ascontiguousarray(labels).view(np.dtype((np.void, labels.dtype.itemsize * n_answers))).ravel()
+    return np.unique(keys, return_inverse=True)[1].ravel()
+
+
+def log_progress(done: int, total: int):
+    logging.debug("Progress: %.02f%% (%d of %d words)" % (100 * done / total, done, total))
+
+
+# State of a worker process of PatternMatrix.build, set once by _start_worker
+_worker_matrix = None
+
+
+def _start_worker(matrix: 'PatternMatrix'):
+    global _worker_matrix
+    _worker_matrix = matrix
+
+
+def _compute_task(start: int, words: Sequence[str]):
+    return start, _worker_matrix.compute(words)
+
+
+class Partition:
+    """
+    Answers grouped by pattern, as offset arrays: members[offsets[g]:offsets[g + 1]]
+    are the answers that got codes[g]. Answers keep their original order
+    inside each group, and groups are ordered by their first answer, just
+    like scoring answers one by one.
+
+    members holds whatever identifies the answers in the row (indexes,
+    names...), so strings are only used if they are given.
+    """
+
+    def __init__(self, row: np.ndarray, answers: np.ndarray):
+        order = np.argsort(row, kind="stable")
+        sorted_codes = row[order]
+        firsts = np.flatnonzero(np.r_[len(row) > 0, sorted_codes[1:] != sorted_codes[:-1]])
+        sizes = np.diff(np.append(firsts, len(row)))
+        # Groups come sorted by code: reorder them by their first answer
+        by_first = np.argsort(order[firsts], kind="stable")
+        rank = np.empty_like(by_first)
+        rank[by_first] = np.arange(len(by_first))
+        regrouped = np.argsort(np.repeat(rank, sizes), kind="stable")
+        self.members = answers[order[regrouped]]
+        self.codes = sorted_codes[firsts[by_first]]
+        self.sizes = sizes[by_first]
+        self.offsets = np.append(0, np.cumsum(self.sizes))
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def group(self, g: int) -> np.ndarray:
+        return self.members[self.offsets[g]:self.offsets[g + 1]]
+
+    def grouping(self, length: int, names: Optional[np.ndarray] = None) -> Grouping:
+        """
+        This partition as a Grouping, whose answer lists are only built when
+        read. names turns members into answer names, if they are not already.
+        """
+        return LazyGrouping(self, length, names)
+
+
+class PatternMatrix:
+    """
+    Feedback pattern of every word against every answer, as a
+    (words x answers) array of integer codes.
+
+    The full matrix is only computed the first time it is needed. Before
+    that (and for words outside the dictionary) rows are scored on demand.
+    """
+
+    def __init__(self, words: List[str], answers: List[str], dictionary=None):
+        """
+        dictionary, a PackedDictionary of these words and answers, provides
+        the letter tables that are otherwise built from the words.
+        """
+        self.words = words
+        self.answers = answers
+        self.length = len(answers[0]) if answers else len(words[0]) if words else 0
+        self.word_index: Dict[str, int] = {w: i for i, w in enumerate(words)}
+        self.answer_index: Dict[str, int] = {a: i for i, a in enumerate(answers)}
+        self._codes = None
+        self._word_letters: Optional[LetterIndex] = None
+        self._inverted: Optional[InvertedIndex] = None
+        if dictionary is None:
+            self.alphabet = build_alphabet(words, answers)
+            self._answer_letters = encode_words(answers, self.length, self.alphabet)
+            self._answer_counts = letter_counts(self._answer_letters, len(self.alphabet) + 1)
+            self.word_array = np.array(words, dtype=str)
+            self.answer_array = np.array(answers, dtype=str)
+            self._fingerprint: Optional[str] = None
+        else:
+            self.alphabet = dictionary.alphabet
+            self._answer_letters = dictionary.letters[dictionary.answer_ids]
+            self._answer_counts = dictionary.counts[:, dictionary.answer_ids]
+            self.word_array = dictionary.word_array
+            self.answer_array = dictionary.answer_array
+            self._word_letters = LetterIndex(dictionary.letters[:dictionary.n_words],
+                                             dictionary.counts[:, :dictionary.n_words], self.alphabet)
+            self._fingerprint = dictionary.fingerprint
+
+    @property
+    def codes(self) -> np.ndarray:
+        if self._codes is None:
+            self.build()
+        return self._codes
+
+    @property
+    def fingerprint(self) -> str:
+        """
+        Identifies these words and answers, whatever their order
+        """
+        if self._fingerprint is None:
+            self._fingerprint = fingerprint(self.words, self.answers)
+        return self._fingerprint
+
+    @property
+    def inverted(self) -> InvertedIndex:
+        """
+        Answers having each letter at each position or a number of times,
+        to find the answers matching feedback without scoring them
+        """
+        if self._inverted is None:
+            self._inverted = InvertedIndex(self._answer_letters, self._answer_counts, self.alphabet)
+        return self._inverted
+
+    @property
+    def word_letters(self) -> LetterIndex:
+        """
+        Letters of every word, indexed to check hard mode constraints in bulk
+        """
+        if self._word_letters is None:
+            letters = encode_words(self.words, self.length, self.alphabet)
+            self._word_letters = LetterIndex(letters, letter_counts(letters, len(self.alphabet) + 1), self.alphabet)
+        return self._word_letters
+
+    def __getstate__(self):
+        # Workers only need what compute uses, never the full matrix
+        state = self.__dict__.copy()
+        state["_codes"] = None
+        return state
+
+    def compute(self, words: Sequence[str]) -> np.ndarray:
+        codes = np.empty((len(words), len(self.answers)), dtype=pattern_dtype(self.length))
+        rows = chunk_rows(len(self.answers) * self.length)
+        for start in range(0, len(words), rows):
+            chunk = encode_words(words[start:start + rows], self.length, self.alphabet)
+            codes[start:start + len(chunk)] = feedback_codes(chunk, self._answer_letters, self._answer_counts)
+        return codes
+
+    def build(self, workers: int = 1, progress: Optional[Callable[[int, int], None]] = log_progress):
+        """
+        Compute the full matrix now, splitting the words across a pool of
+        worker processes (0 means one per CPU). Each worker fills its own rows,
+        so the result is the same whatever the number of workers.
+        progress, if given, is called with (words done, total words).
+        """
+        if self._codes is not None:
+            return
+        total = len(self.words)
+        codes = np.empty((total, len(self.answers)), dtype=pattern_dtype(self.length))
+        done = 0
+        tiles = [(start, self.words[start:start + TASK_SIZE]) for start in range(0, total, TASK_SIZE)]
+        for start, chunk in self.compute_tiles(tiles, workers):
+            codes[start:start + len(chunk)] = chunk
+            done += len(chunk)
+            if progress:
+                progress(done, total)
+        self._codes = codes
+
+    def compute_tiles(self, tiles: Sequence[Tuple[int, Sequence[str]]],
+                      workers: int = 1) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        Codes of the words of every tile, given as (start, words), yielded as
+        (start, codes) as soon as each tile is done: in order with a single
+        worker process, in any order with several (0 means one per CPU).
+        Stopping early cancels the tiles not started yet.
+        """
+        workers = workers or os.cpu_count() or 1
+        if workers == 1 or len(tiles) <= 1:
+            for start, words in tiles:
+                yield start, self.compute(words)
+            return
+
+        # Only imported when needed, as it is slow to import and most runs never get here
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+
+        logging.debug("Computing patterns of %d tiles with %d workers" % (len(tiles), workers))
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_start_worker, initargs=(self,))
+        try:
+            tasks = [pool.submit(_compute_task, start, words) for start, words in tiles]
+            for task in as_completed(tasks):
+                yield task.result()
+        finally:
+            pool.shutdown(cancel_futures=True)
+
+    def row(self, word: str) -> np.ndarray:
+        """
+        Codes of a word against every answer
+        """
+        index = self.word_index.get(word)
+        if index is not None and self._codes is not None:
+            return self._codes[index]
+        return self.compute([word])[0]
+
+    def grouping(self, row: np.ndarray, answer_ids: np.ndarray) -> Grouping:
+        """
+        Build a Grouping out of a row already restricted to answer_ids
+        """
+        return Partition(row, answer_ids).grouping(self.length, self.answer_array)
@@ -0,0 +1,340 @@
+import heapq
+import math
+from typing import Callable, Collection, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .common import Grouping, Space
+from .patterns import Partition, chunk_rows, partition_classes, pattern_counts, pattern_dtype
+
+
+def entropy(sizes: np.ndarray, n_answers: int) -> np.ndarray:
+    """
+    Bits of information of each row of group sizes, rounded so that rows
+    holding the same sizes in a different order tie exactly
+    """
+    counts = np.arange(n_answers + 1)
+    xlogx = counts * np.log2(np.maximum(counts, 1))
+    return np.round(math.log2(max(n_answers, 1)) - row_sums(xlogx, sizes) / max(n_answers, 1), 9)
+
+
+def sampled_entropy(sizes: np.ndarray, n_sampled: int, n_answers: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Entropy of each row of group sizes counted over a sample of n_sampled
+    answers, drawn without replacement out of n_answers, as an estimate of
+    the entropy over all of them, along with its standard error. The
+    estimate is the mean of the bits each sampled answer gets from its group,
+    so the error follows their spread, and it is exact (with no error) once
+    the sample holds every answer.
+    """
+    m = max(n_sampled, 1)
+    counts = np.arange(n_sampled + 1)
+    bits = np.log2(m / np.maximum(counts, 1))
+    mean = row_sums(counts * bits, sizes) / m
+    spread = np.maximum(row_sums(counts * np.square(bits), sizes) / m - np.square(mean), 0)
+    unsampled = (n_answers - n_sampled) / max(n_answers - 1, 1)
+    return np.round(mean, 9), np.sqrt(spread / m * unsampled)
+
+
+def expected_size(sizes: np.ndarray, n_answers: int) -> np.ndarray:
+    """
+    Answers left on average after each row of group sizes
+    """
+    squares = np.zeros(len(sizes), dtype=np.int64)
+    rows = chunk_rows(sizes.shape[1])
+    for start in range(0, len(sizes), rows):
+        squares[start:start + rows] = np.square(sizes[start:start + rows], dtype=np.int64).sum(axis=1)
+    return squares / max(n_answers, 1)
+
+
+def row_sums(table: np.ndarray, sizes: np.ndarray) -> np.ndarray:
+    """
+    Sum of table[size] over each row of sizes, a few rows at a time, so the
+    temporaries stay small however many groups rows hold
+    """
+    sums = np.zeros(len(sizes), dtype=table.dtype)
+    rows = chunk_rows(sizes.shape[1])
+    for start in range(0, len(sizes), rows):
+        sums[start:start + rows] = table[sizes[start:start + rows]].sum(axis=1)
+    return sums
+
+
+class GuessMetrics:
+    """
+    How every word of a space splits its answers, as a table with one column
+    per metric (and one entry per word, in the order of the space):
+
+    - splits: number of groups
+    - largest: size of the largest group, the worst case
+    - singletons: groups holding a single answer
+    - entropy: bits of information
+    - expected_size: answers left on average
+    - is_answer: whether the word may be the answer
+
+    Entropy and expected size are only computed when first asked for. Words
+    are ranked by any metrics with the top or ranked functions, which only
+    sort the few words that can make it to the top, with a heap.
+    """
+
+    def __init__(self, group_sizes: np.ndarray, n_answers: int, is_answer: np.ndarray):
+        self.splits = np.count_nonzero(group_sizes, axis=1)
+        self.largest = group_sizes.max(axis=1, initial=0).astype(int)
+        self.singletons = np.count_nonzero(group_sizes == 1, axis=1)
+        self.is_answer = is_answer
+        self.__group_sizes = group_sizes
+        self.__n_answers = n_answers
+        self.__entropy = None
+        self.__expected_size = None
+
+    @property
+    def entropy(self) -> np.ndarray:
+        if self.__entropy is None:
+            self.__entropy = entropy(self.__group_sizes, self.__n_answers)
+        return self.__entropy
+
+    @property
+    def expected_size(self) -> np.ndarray:
+        if self.__expected_size is None:
+            self.__expected_size = expected_size(self.__group_sizes, self.__n_answers)
+        return self.__expected_size
+
+    def __len__(self) -> int:
+        return len(self.splits)
+
+    def rows(self, keep: np.ndarray) -> 'GuessMetrics':
+        """
+        These metrics for the words kept (by a boolean mask or indexes),
+        along with whatever was computed for them so far
+        """
+        metrics = GuessMetrics.__new__(GuessMetrics)
+        metrics.splits, metrics.largest = self.splits[keep], self.largest[keep]
+        metrics.singletons, metrics.is_answer = self.singletons[keep], self.is_answer[keep]
+        metrics.__group_sizes = self.__group_sizes[keep]
+        metrics.__n_answers = self.__n_answers
+        metrics.__entropy = None if self.__entropy is None else self.__entropy[keep]
+        metrics.__expected_size = None if self.__expected_size is None else self.__expected_size[keep]
+        return metrics
+
+
+def top(k: int, *keys: np.ndarray) -> List[int]:
+    """
+    Indexes of the k entries ranking highest by keys (arrays of the same
+    length, such as columns of GuessMetrics), compared in order. Ties keep
+    their original order, as a stable sort in reverse would.
+    """
+    n = len(keys[0])
+    k = min(k, n)
+    if k <= 0:
+        return []
+    primary = np.asarray(keys[0])
+    if k == n:
+        candidates = np.arange(n)
+    else:
+        # Entries below the k-th best primary key can't make it
+        candidates = np.flatnonzero(primary >= np.partition(primary, n - k)[n - k])
+    rows = zip(*(np.asarray(key)[candidates].tolist() for key in keys), (-candidates).tolist())
+    return [-row[-1] for row in heapq.nlargest(k, rows)]
+
+
+def ranked(*keys: np.ndarray) -> Iterator[int]:
+    """
+    Every index, ranked as in top, for when it is not known upfront how
+    many will be needed
+    """
+    done, k = 0, 16
+    while done < len(keys[0]):
+        best = top(k, *keys)
+        yield from best[done:]
+        done, k = len(best), 4 * k
+
+
+# Up to this many answers, words splitting them the same way are collapsed (with more, few of them
+# do, and telling which costs more than scoring them all)
+COLLAPSE_ANSWERS = 32
+
+
+class PatternSpace(Mapping):
+    """
+    A Space stored as the pattern codes of its words (rows) against its
+    answers (columns), instead of answer lists. Groupings are only built
+    when a word is looked up.
+
+    words and answers are kept as numpy string arrays (lists are converted),
+    and codes may be memory mapped: nothing is read until it is needed.
+    """
+
+    def __init__(self, words: Sequence[str], answers: Sequence[str], codes: np.ndarray, length: int):
+        self.words = words if isinstance(words, np.ndarray) else np.array(words, dtype=str)
+        self.answers = answers if isinstance(answers, np.ndarray) else np.array(answers, dtype=str)
+        self.codes = codes
+        self.length = length
+        self._word_list: Optional[List[str]] = None
+        self._index: Optional[Dict[str, int]] = None
+        self._answer_index: Optional[Dict[str, int]] = None
+        self._group_sizes: Optional[np.ndarray] = None
+        self._answer_words: Optional[np.ndarray] = None
+        self._metrics: Optional[GuessMetrics] = None
+        self._representatives: Union[None, bool, 'PatternSpace'] = None
+
+    @classmethod
+    def splitting(cls, words: np.ndarray, answers: np.ndarray, codes: np.ndarray, length: int,
+                  is_answer: Callable[[str], bool]) -> 'PatternSpace':
+        """
+        Build a PatternSpace keeping only the words that split the answers,
+        or that may be the answer themselves.
+        """
+        # A word whose row holds a single pattern does not split the answers
+        keep = (codes != codes[:, :1]).any(axis=1)
+        for i in np.flatnonzero(~keep):
+            keep[i] = is_answer(words[i])
+        return PatternSpace(words[keep], answers, codes[keep], length)
+
+    @classmethod
+    def of(cls, space: Space) -> 'PatternSpace':
+        """
+        Pack any Space (such as a dict of groupings) into a PatternSpace
+        """
+        if isinstance(space, PatternSpace):
+            return space
+        words = list(space)
+        answers: Dict[str, int] = dict()
+        length = 0
+        for grouping in space.values():
+            for mask, group in grouping.items():
+                length = len(mask.mask)
+                for answer in group:
+                    answers.setdefault(answer, len(answers))
+        codes = np.zeros((len(words), len(answers)), dtype=pattern_dtype(length))
+        for i, grouping in enumerate(space.values()):
+            for mask, group in grouping.items():
+                codes[i, [answers[answer] for answer in group]] = mask.code
+        return PatternSpace(words, list(answers), codes, length)
+
+    @property
+    def word_list(self) -> List[str]:
+        if self._word_list is None:
+            self._word_list = self.words.tolist()
+        return self._word_list
+
+    @property
+    def index(self) -> Dict[str, int]:
+        """
+        Row of each word
+        """
+        if self._index is None:
+            self._index = {w: i for i, w in enumerate(self.word_list)}
+        return self._index
+
+    @property
+    def answer_index(self) -> Dict[str, int]:
+        """
+        Column of each answer
+        """
+        if self._answer_index is None:
+            self._answer_index = {a: i for i, a in enumerate(self.answers.tolist())}
+        return self._answer_index
+
+    @property
+    def group_sizes(self) -> np.ndarray:
+        """
+        Size of the group of answers each word gets for every pattern, as a
+        (words x patterns) array indexed by pattern code (or only the groups
+        it gets, for long words: see pattern_counts)
+        """
+        if self._group_sizes is None:
+            self._group_sizes = pattern_counts(self.codes, 3 ** self.length)
+        return self._group_sizes
+
+    @property
+    def metrics(self) -> GuessMetrics:
+        """
+        Metrics of every word, computed in bulk without building any group
+        """
+        if self._metrics is None:
+            self._metrics = GuessMetrics(self.group_sizes, len(self.answers), self.answer_words)
+        return self._metrics
+
+    @property
+    def answer_words(self) -> np.ndarray:
+        """
+        Whether each word is one of the answers
+        """
+        if self._answer_words is None:
+            self._answer_words = np.isin(self.words, self.answers)
+        return self._answer_words
+
+    def narrowed(self, answers: Sequence[str], is_answer: Callable[[str], bool],
+                 words: Optional[Collection[str]] = None) -> 'PatternSpace':
+        """
+        This space restricted to some of its answers (and, optionally, to some
+        of its words). Only the columns of the remaining answers are read, so
+        the cost follows the size of answers rather than the whole dictionary.
+        Raises KeyError if an answer is not part of this space.
+        """
+        columns = np.array([self.answer_index[a] for a in answers], dtype=int)
+        if words is None:
+            rows = np.arange(len(self))
+        else:
+            rows = np.array([i for i, w in enumerate(self.word_list) if w in words], dtype=int)
+        return PatternSpace.splitting(self.words[rows], self.answers[columns],
+                                      self.codes[np.ix_(rows, columns)], self.length, is_answer)
+
+    @property
+    def representatives(self) -> 'PatternSpace':
+        """
+        This space with a single word for each way of splitting the answers,
+        computed once for it: words splitting them like an answer, or like a
+        word that comes before, are left out (answers themselves are always
+        kept). A word left out scores the same as the one kept on every
+        metric of GuessMetrics, and comes after it when they tie, so
+        strategies ranking words by those choose the same word out of far
+        fewer (Heuristic, which looks at the words around its best ones,
+        keeps to the whole space). Late in a game, thousands of words
+        collapse into a few.
+        """
+        if len(self.answers) > COLLAPSE_ANSWERS:
+            return self
+        if self._representatives is None:
+            collapsed = self.collapsed()
+            # Not kept when it is this space: a space referring to itself is only freed by the garbage
+            # collector, which runs by count of objects and so lets large codes pile up game after game
+            self._representatives = False if collapsed is self else collapsed
+        return self if self._representatives is False else self._representatives
+
+    def collapsed(self) -> 'PatternSpace':
+        """
+        This space keeping, for every class of partition_classes, its answers
+        or else its first word
+        """
+        classes = partition_classes(np.asarray(self.codes))
+        is_answer = self.answer_words
+        with_answer = np.zeros(len(self), dtype=bool)
+        with_answer[classes[is_answer]] = True
+        first = np.full(len(self), len(self), dtype=int)
+        np.minimum.at(first, classes, np.arange(len(self)))
+        keep = is_answer | (~with_answer[classes] & (first[classes] == np.arange(len(self))))
+        if keep.all():
+            return self
+        collapsed = PatternSpace(self.words[keep], self.answers, self.codes[keep], self.length)
+        # Group sizes and metrics are computed once for the state, whichever space they are read from
+        collapsed._group_sizes = self.group_sizes[keep]
+        collapsed._metrics = self.metrics.rows(keep)
+        return collapsed
+
+    def partition(self, word: str) -> Partition:
+        """
+        How word splits the answers, as a Partition of answer columns
+        """
+        return Partition(self.codes[self.index[word]], np.arange(len(self.answers)))
+
+    def __getitem__(self, word: str) -> Grouping:
+        return self.partition(word).grouping(self.length, self.answers)
+
+    def __contains__(self, word) -> bool:
+        return word in self.index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.word_list)
+
+    def __len__(self) -> int:
+        return len(self.words)
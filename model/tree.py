@@ -0,0 +1,203 @@
+import logging
+import math
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .engine import Engine
+from .masks import Mask
+from .patterns import DENSE_PATTERNS, Partition
+
+
+class DecisionTree:
+    """
+    What to guess in a given state of the game, and where to go next for
+    every mask that guess may get back. solves tells whether the guess is
+    one of the answers still possible at this point.
+    """
+
+    def __init__(self, guess: str, children: Optional[Dict[str, 'DecisionTree']] = None, solves: bool = True):
+        self.guess = guess
+        self.children = children or dict()
+        self.solves = solves
+
+    def next(self, mask: Mask) -> Optional['DecisionTree']:
+        return self.children.get(str(mask))
+
+    @property
+    def depth(self) -> int:
+        return 1 + max((child.depth for child in self.children.values()), default=0)
+
+    @property
+    def answers(self) -> int:
+        return int(self.solves) + sum(child.answers for child in self.children.values())
+
+    def total_guesses(self, depth: int = 1) -> int:
+        """
+        Guesses needed to solve, one game at a time, every answer reachable from here
+        """
+        return depth * self.solves + sum(child.total_guesses(depth + 1) for child in self.children.values())
+
+    def to_json(self):
+        return {"guess": self.guess, "solves": self.solves,
+                "next": {mask: child.to_json() for mask, child in self.children.items()}}
+
+    @classmethod
+    def from_json(cls, data) -> 'DecisionTree':
+        return DecisionTree(data["guess"], {mask: cls.from_json(child) for mask, child in data["next"].items()},
+                            data["solves"])
+
+
+# Up to this many answers, distinct patterns are counted by comparing answers pairwise
+PAIRWISE_LIMIT = 24
+
+
+def count_patterns(columns: np.ndarray, n_patterns: int) -> np.ndarray:
+    """
+    Number of distinct patterns of every word, out of an (answers x words)
+    array of pattern codes.
+    """
+    n, n_words = columns.shape
+    if n <= PAIRWISE_LIMIT:
+        count = np.ones(n_words, dtype=int)
+        for j in range(1, n):
+            new = columns[j] != columns[0]
+            for k in range(1, j):
+                new &= columns[j] != columns[k]
+            count += new
+        return count
+    if n_patterns > DENSE_PATTERNS:
+        # Too many patterns to flag each: count where sorted codes change
+        ordered = np.sort(columns, axis=0)
+        return 1 + np.count_nonzero(ordered[1:] != ordered[:-1], axis=0)
+    seen = np.zeros((n_patterns, n_words), dtype=bool)
+    seen[columns, np.arange(n_words)] = True
+    return np.count_nonzero(seen, axis=0)
+
+
+class TreeSolver:
+    """
+    Finds the decision tree that solves every eligible answer of an engine
+    with the fewest guesses in total, i.e. the lowest expected number of
+    guesses, optionally never using more than max_depth guesses.
+
+    States are sets of remaining answers, memoized by their sorted indexes.
+    Guesses are tried from the lowest lower bound up (a group of n answers
+    needs at least 2n - 1 guesses), which prunes both guesses and whole
+    subtrees as soon as they cannot beat the best tree found so far. Guesses
+    that do not split the answers, or split them exactly like a guess that
+    was already tried, are skipped.
+
+    The search is exact when candidates is None. Otherwise only the
+    candidates most promising guesses (by lower bound) of each state are
+    tried, which is much faster and usually just as good.
+    """
+
+    def __init__(self, engine: Engine, candidates: Optional[int] = None, max_depth: Optional[int] = None):
+        patterns = engine.patterns
+        self._words = [patterns.words[i] for i in engine.word_ids]
+        self._answers = patterns.answers
+        self._codes = patterns.codes[engine.word_ids]
+        # Answers by words, so the columns of a subset of answers are contiguous
+        self._columns = np.ascontiguousarray(self._codes.T)
+        self._answer_of_word = np.array([patterns.answer_index.get(w, -1) for w in self._words], dtype=int)
+        self._subset = np.sort(engine.answer_ids).astype(np.min_scalar_type(len(self._answers)))
+        self._length = patterns.length
+        self._solved = 3 ** patterns.length - 1
+        self._candidates = candidates
+        self._max_depth = max_depth
+        self._memo: Dict[Tuple[int, bytes], Tuple[float, Optional[int]]] = dict()
+
+    def solve(self) -> DecisionTree:
+        left = self._max_depth or len(self._subset)
+        cost = self._cost(self._subset, left, math.inf)
+        if cost == math.inf:
+            raise ValueError("There is no tree solving every answer within %d guesses" % left)
+        logging.debug("Best tree takes %d guesses for %d answers (%d states explored)"
+                      % (cost, len(self._subset), len(self._memo)))
+        return self._tree(self._subset, left)
+
+    def _key(self, subset: np.ndarray, left: int) -> Tuple[int, bytes]:
+        return left if self._max_depth else 0, subset.tobytes()
+
+    def _cost(self, subset: np.ndarray, left: int, bound: float) -> float:
+        """
+        Total guesses of the best tree for subset, when it is below bound.
+        Otherwise returns a lower bound that is at least bound.
+        """
+        n = len(subset)
+        if n == 1:
+            return 1 if left >= 1 else math.inf
+        if left <= 1:
+            return math.inf
+        key = self._key(subset, left)
+        known = self._memo.get(key)
+        if known is not None and (known[1] is not None or known[0] >= bound):
+            return known[0]
+
+        best, best_guess = bound, None
+        for guess, lower, buckets in self._guesses(subset, left):
+            if lower >= best:
+                break
+            # Every answer spends this guess, then each bucket needs its own tree
+            total, rest = n, lower - n
+            for bucket in buckets:
+                rest -= 2 * len(bucket) - 1
+                total += self._cost(bucket, left - 1, best - total - rest)
+                if total + rest >= best:
+                    break
+            else:
+                best, best_guess = total, guess
+
+        if best_guess is None:
+            best = max(best, known[0] if known else 0)
+        self._memo[key] = (best, best_guess)
+        return best
+
+    def _split(self, row: np.ndarray, subset: np.ndarray) -> List[Tuple[int, np.ndarray]]:
+        """
+        Answers of subset grouped by pattern, leaving out the solved one
+        """
+        partition = Partition(row, subset)
+        return [(int(code), partition.group(g)) for g, code in enumerate(partition.codes) if code != self._solved]
+
+    def _guesses(self, subset: np.ndarray, left: int) -> Iterator[Tuple[int, int, List[np.ndarray]]]:
+        """
+        Useful guesses for subset as (word, lower bound, buckets), by increasing
+        lower bound. With only two guesses left, that is the ones leaving a
+        single answer for the last guess.
+        """
+        n = len(subset)
+        columns = self._columns[subset]
+        in_subset = np.zeros(len(self._answers) + 1, dtype=bool)
+        in_subset[subset] = True
+        solves = in_subset[self._answer_of_word]
+        n_buckets = count_patterns(columns, self._solved + 1)
+        lower = 3 * n - solves - n_buckets
+        order = np.lexsort((~solves, lower))
+        useful = n_buckets == n if left == 2 else (n_buckets > 1) | solves
+        order = order[useful[order]]
+
+        seen = set()
+        tried_solving = False
+        for guess in order:
+            buckets = sorted((bucket for _, bucket in self._split(columns[:, guess], subset)), key=len, reverse=True)
+            signature = (bool(solves[guess]), tuple(sorted(bucket.tobytes() for bucket in buckets)))
+            if signature in seen:
+                continue
+            seen.add(signature)
+            if self._candidates is not None and len(seen) > self._candidates:
+                if tried_solving:
+                    return
+                if not solves[guess]:
+                    continue
+            tried_solving |= bool(solves[guess])
+            yield int(guess), int(lower[guess]), buckets
+
+    def _tree(self, subset: np.ndarray, left: int) -> DecisionTree:
+        if len(subset) == 1:
+            return DecisionTree(self._answers[subset[0]])
+        guess = self._memo[self._key(subset, left)][1]
+        children = {str(Mask.of(code, self._length)): self._tree(bucket, left - 1)
+                    for code, bucket in self._split(self._codes[guess, subset], subset)}
+        return DecisionTree(self._words[guess], children, self._answer_of_word[guess] in subset)
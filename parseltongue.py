@@ -1,13 +1,30 @@
+import copy
 import logging
+import sys
 from random import choice, sample
-from typing import Iterable, List, Optional
+from functools import partial
+from typing import Callable, Iterable, List, Optional
 
 from gameplay import Guidance, RemainingAnswerGuidance, CompleteGuidance
-from gameplay import guidance, SpaceSearch, HumanPlayer
+from gameplay import guidance, SpaceSearch, HumanPlayer, TreeSearch, BoardsSearch, Player, load_tree
 # TODO: do not depend on computer
 from gameplay.computer import Computer
-from model import Engine, MutableEngine, MaskInstance, Mask
-from strategies import Heuristic
+from gameplay.data import replace_atomically
+from gameplay.memo import GuessMemo, get_memo_file
+from model import Boards, Engine, MutableEngine, MaskInstance, Mask, instrumentation, load_file_as_list
+from model.dictionary import write_dictionary
+from model.minimax import adversarial_mask
+from strategies import Strategy, Scoring, Greedy, Heuristic, Entropy, ExpectedSize, ExpectedGuesses, Sampling
+
+STRATEGIES = {
+    "strategy": Strategy,
+    "greedy": Greedy,
+    "heuristic": Heuristic,
+    "entropy": Entropy,
+    "expected-size": ExpectedSize,
+    "expected-guesses": ExpectedGuesses,
+    "sampling": Sampling,
+}
 
 
 class Visitor:
@@ -68,6 +85,26 @@ class InputEvaluator(Evaluator):
         self.__n_masks = self.__n_masks - 1
 
 
+class AdversarialEvaluator(Evaluator):
+    """
+    Has no answer until it is forced to, like Absurdle: every guess gets the
+    mask keeping the most answers eligible (see adversarial_mask)
+    """
+    def __init__(self, engine: Engine):
+        # A copy, as mutable engines prune themselves
+        self.__engine = copy.copy(engine)
+
+    def evaluate(self, guess) -> Iterable[MaskInstance]:
+        mask = MaskInstance(adversarial_mask(self.__engine, guess), guess)
+        self.__engine = self.__engine.pruned(mask)
+        for visitor in self._visitors:
+            visitor.visit(guess, mask.mask)
+        return [mask]
+
+    def answer_found(self, guess):
+        pass
+
+
 class GuessQualityVisitor(Visitor):
     def __init__(self, engine: Engine):
         self.__engine = engine
@@ -85,9 +122,9 @@ class GuessQualityVisitor(Visitor):
 
 from argparse import ArgumentParser, BooleanOptionalAction
 
-def stats(engine: Engine):
+def stats(engine: Engine, workers: int = 1):
     print("Overall information regarding starting words")
-    computer = Computer(engine)
+    computer = Computer(engine, workers=workers)
     print("Calculating solution space, this can take a while...")
     sol_space = computer.solution_space
     answers = engine.eligible_answers
@@ -95,51 +132,172 @@ def stats(engine: Engine):
 
     exit(0)
 
+def compile_dictionary(arguments):
+    words = load_file_as_list(arguments.dictionary)
+    answers = load_file_as_list(arguments.solutions)
+    replace_atomically(arguments.packed, lambda outfile: write_dictionary(outfile, words, answers))
+    print("Packed %d words and %d answers into %s" % (len(words), len(answers), arguments.packed))
+
+    exit(0)
+
+def engine_loader(arguments, engine_class=Engine) -> Callable[..., Engine]:
+    """
+    Makes engines of the game (given hard_mode), from the packed dictionary if there is one
+    """
+    if arguments.packed:
+        return partial(engine_class.load, arguments.packed)
+    return partial(engine_class, arguments.solutions, arguments.dictionary)
+
+def memo_loader(arguments) -> Optional[GuessMemo]:
+    return GuessMemo(get_memo_file()) if arguments.memo else None
+
+def new_strategy(name: str, arguments) -> Strategy:
+    if name == "sampling" and arguments.time_budget is not None:
+        return Sampling(arguments.time_budget)
+    return STRATEGIES[name]()
+
+def benchmark(engine: Engine, arguments):
+    # Only bench needs process pools and reports
+    from gameplay.bench import bench
+
+    answers = sorted(engine.eligible_answers)
+    if arguments.sample:
+        answers = sample(answers, min(arguments.sample, len(answers)))
+    strategies = [new_strategy(name, arguments) for name in arguments.strategy]
+    openers = [opener.split(",") for opener in arguments.first_words or []]
+    reports = bench(engine_loader(arguments), strategies, openers, answers,
+                    hard_mode=arguments.hard, workers=arguments.workers, memo=memo_loader(arguments))
+    for report in reports:
+        print(report)
+        print()
+
+    exit(0)
+
+def replay_games(arguments):
+    # Only replay needs process pools
+    from gameplay.replay import replay
+
+    with open(arguments.games) if arguments.games != "-" else sys.stdin as games:
+        for result in replay(engine_loader(arguments), games, hard_mode=arguments.hard, workers=arguments.workers):
+            print(result)
+
+    exit(0)
+
+def serve(arguments):
+    # Only serve needs an event loop
+    from gameplay.serve import serve as serve_games
+
+    strategies = {name: new_strategy(name, arguments) for name in STRATEGIES}
+    serve_games(engine_loader(arguments), strategies, arguments.strategy[0],
+                hard_mode=arguments.hard, workers=arguments.workers, socket_path=arguments.socket)
+
+    exit(0)
+
 def main():
     logging.root.setLevel(logging.INFO)
     argp = ArgumentParser(allow_abbrev=True)
     # For all modes
     argp.add_argument("--hard", action=BooleanOptionalAction, help="Hard Mode rules")
-    argp.add_argument("--solutions", type=str, help="file containing the eligible answers", required=True)
-    argp.add_argument("--dictionary", type=str, help="file containing the word dictionary", required=True)
-
-    argp.add_argument("mode", choices=["play", "solve", "stats"], help="you PLAY the game or I SOLVE it")
+    argp.add_argument("--solutions", type=str, help="file containing the eligible answers")
+    argp.add_argument("--dictionary", type=str, help="file containing the word dictionary")
+    argp.add_argument("--packed", type=str,
+                      help="packed dictionary to load instead of --solutions and --dictionary " +
+                      "(COMPILE writes it from them, which makes starting up faster)")
+    argp.add_argument("--workers", type=int, default=1,
+                      help="Processes used to build the solution space when it is not cached (0 for one per CPU)")
+    argp.add_argument("--memo", action=BooleanOptionalAction, default=True,
+                      help="Remember the guesses chosen (and the guidance given) in each state of a game, " +
+                      "across runs, in a SQLite file next to the other caches")
+    argp.add_argument("--profile", type=str, nargs="?", const="-", metavar="FILE",
+                      help="Write a JSON report of counters, timers and memory, per turn and overall, " +
+                      "to FILE (or stderr) when done. Worker processes are not profiled")
+
+    argp.add_argument("mode", choices=["play", "solve", "stats", "bench", "compile", "serve", "replay"],
+                      help="you PLAY the game or I SOLVE it (BENCH solves every answer, " +
+                      "COMPILE packs the dictionary, SERVE solves many games over JSON lines, " +
+                      "REPLAY tells how recorded games could have done better)")
     # For play
     argp.add_argument("--guidance", choices=["no", "remaining", "computer"], default="no",
                       help="How much guidance you want to play the game. " +
                       "no means no guidance, remaining shows remaining answers, " +
                       "computer shows best answers at each step")
     # It would be really nice to create an evaluator that plugs into wordle / termo / quordle / letreco of the day
-    argp.add_argument("--evaluator", choices=["answers", "input"],
-                      help="How guesses will be evaluated. A known answer, or from the input")
+    argp.add_argument("--evaluator", choices=["answers", "input", "adversary"],
+                      help="How guesses will be evaluated. A known answer, from the input, " +
+                      "or by an adversary keeping as many answers eligible as it can (like Absurdle)")
     argp.add_argument("--answers", type=str, nargs='+',
                       help="The answer(s) to this game. Required when evaluator is 'answers'")
     argp.add_argument("--random-answers", action=BooleanOptionalAction, default=False, help="In play mode, generate answers of play")
     argp.add_argument("--quantity", type=int, default=1, help="Number of words in the game.")
     argp.add_argument("--guide-first", action=BooleanOptionalAction, help="Give guidance for first guess")
-    argp.add_argument("--first-words", type=str, nargs='+', help="When running the solver, choose its first words")
+    argp.add_argument("--first-words", type=str, nargs='+',
+                      help="When running the solver, choose its first words. " +
+                      "In bench mode, each one is a different opener to compare (use commas for several words)")
+    # For solve and bench
+    argp.add_argument("--strategy", choices=STRATEGIES.keys(), nargs='+', default=["heuristic"],
+                      help="Strategy used by the solver (entropy when solving several words, unless it is " +
+                      "entropy, expected-size or expected-guesses). In bench mode, all of them are compared")
+    # For solve
+    argp.add_argument("--tree", action=BooleanOptionalAction, default=False,
+                      help="Solve by walking the decision tree with the fewest expected guesses (not for hard mode)")
+    argp.add_argument("--minimax", action=BooleanOptionalAction, default=False,
+                      help="Solve by walking the decision tree with the fewest guesses in the worst case, " +
+                      "which proves how many guesses the game needs (not for hard mode)")
+    argp.add_argument("--tree-candidates", type=int, default=10,
+                      help="Guesses tried in each state when building the tree (0 for all of them, which is exact but slow)")
+    argp.add_argument("--time-budget", type=float, metavar="SECONDS",
+                      help="Choose every guess within this many seconds, whatever the size of the dictionary, " +
+                      "with the sampling strategy (which estimates from samples of the answers). " +
+                      "With computer guidance, estimate the best words within it")
+    argp.add_argument("--max-depth", type=int, help="Never use more guesses than this in the decision tree")
+    # For bench
+    argp.add_argument("--sample", type=int, help="In bench mode, only play this many random answers")
+    # For replay
+    argp.add_argument("--games", type=str, default="-",
+                      help="In replay mode, JSON lines of recorded games, such as " +
+                      '{"answer": "cigar", "guesses": ["raise", "cigar"]} (- for stdin)')
+    # For serve
+    argp.add_argument("--socket", type=str, help="In serve mode, listen on this unix socket instead of stdin")
 
     arguments = argp.parse_args()
-
-    engine = MutableEngine(arguments.solutions, arguments.dictionary, hard_mode=arguments.hard)
-    computer = Computer(engine)
+    if arguments.profile:
+        instrumentation.enable(arguments.profile, mode=arguments.mode, arguments=sys.argv[1:])
+    if arguments.tree and arguments.minimax:
+        argp.error("--tree and --minimax are different trees, pick one")
+    if (arguments.tree or arguments.minimax) and arguments.hard:
+        argp.error("--tree and --minimax do not support hard mode")
+    if arguments.mode == "compile":
+        if not (arguments.solutions and arguments.dictionary and arguments.packed):
+            argp.error("compile needs --solutions, --dictionary and --packed")
+        compile_dictionary(arguments)
+    if not arguments.packed and not (arguments.solutions and arguments.dictionary):
+        argp.error("--solutions and --dictionary are required, unless --packed is given")
+
+    engine = engine_loader(arguments, MutableEngine)(hard_mode=arguments.hard)
+    patterns = engine.patterns
+    for opener in arguments.first_words or []:
+        if any(len(word) != patterns.length or any(c not in patterns.alphabet for c in word)
+               for word in opener.split(",")):
+            argp.error("--first-words %r: expected %d letter words made of letters of the game, separated by commas"
+                       % (opener, patterns.length))
+    computer = Computer(engine, workers=arguments.workers, memo=memo_loader(arguments))
 
     if arguments.mode == "stats":
-        stats(engine)
+        stats(engine, arguments.workers)
+    if arguments.mode == "bench":
+        benchmark(engine, arguments)
+    if arguments.mode == "serve":
+        serve(arguments)
+    if arguments.mode == "replay":
+        replay_games(arguments)
 
     if arguments.guidance == "remaining":
         guide = RemainingAnswerGuidance(engine)
     elif arguments.guidance == "computer":
-        guide = CompleteGuidance(engine, computer, not arguments.guide_first)
+        guide = CompleteGuidance(engine, computer, not arguments.guide_first, arguments.time_budget)
     else:
         guide = Guidance()
 
-    if arguments.mode == "solve":
-        # TODO: Allow strategy to be chosen
-        solver = SpaceSearch(computer, strategy=Heuristic())
-    else:
-        solver = HumanPlayer(engine, guide)
-
     answers = []
     if arguments.evaluator == "answers":
         if arguments.random_answers:
@@ -149,10 +307,35 @@ def main():
             answers = arguments.answers
             n = len(arguments.answers)
         evaluator = KnownAnswerEvaluator(*answers)
+    elif arguments.evaluator == "adversary":
+        if arguments.quantity != 1:
+            argp.error("the adversary only plays games of a single word")
+        evaluator = AdversarialEvaluator(engine)
+        n = 1
     else:
         evaluator = InputEvaluator(arguments.quantity)
         n = arguments.quantity
 
+    if arguments.mode == "solve":
+        strategy = new_strategy("sampling" if arguments.time_budget is not None else arguments.strategy[0], arguments)
+
+        def searcher(*first_words: str) -> Player:
+            if n == 1:
+                return SpaceSearch(computer, strategy, *first_words)
+            # Several boards are solved together, which takes a strategy scoring every word at once
+            scoring = strategy if isinstance(strategy, Scoring) else Entropy()
+            return BoardsSearch(computer, Boards(engine, n), scoring, *first_words)
+
+        solver = searcher(*(arguments.first_words or []))
+        if arguments.tree or arguments.minimax:
+            tree = load_tree(engine, arguments.tree_candidates or None, arguments.max_depth, arguments.workers,
+                             arguments.minimax)
+            if arguments.minimax:
+                logging.info("The tree solves every answer within %d guesses" % tree.depth)
+            solver = TreeSearch(tree, searcher())
+    else:
+        solver = HumanPlayer(engine, guide)
+
     remaining = n
     for op in range(5 + remaining):
         guess = solver.provide()
@@ -161,6 +344,7 @@ def main():
         masks = evaluator.evaluate(guess)
         [print("", mask) for mask in masks]
         solver.accept(*masks)
+        instrumentation.end_turn(guess=guess)
         if any(m.mask.solved for m in masks):
             remaining = remaining - 1
             print("Solved %s in %d tries%s" % (guess.upper(), op + 1, (" %d remaining" % remaining) if remaining > 0 else ""))
@@ -1,24 +1,30 @@
 import logging
-from typing import Tuple, Iterable
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 
-from model import Space, Grouping
+import numpy as np
+
+from model import Space, Grouping, PatternSpace
+from model.instrumentation import timed
+from model.patterns import pattern_counts
+from model.space import GuessMetrics, entropy, expected_size, ranked, row_sums, sampled_entropy, top
 
 class Strategy:
+    @property
+    def key(self) -> str:
+        """
+        Tells this strategy, as set up, apart from others when its choices are remembered
+        """
+        return type(self).__name__
+
+    @timed("strategy.choose")
     def choose(self, space: Space) -> str:
         logging.debug("Choosing in space among %d words available" % len(space))
-        chunked_answers = list(answers for choice in space.values() for answers in choice.values())
-        answers = set(ans for answers in chunked_answers for ans in answers)
-
-        sol = max(space.items(), key=lambda it: self._score(it[1], it[0] in answers))
-        return sol[0]
+        space = PatternSpace.of(space).representatives
+        metrics = space.metrics
 
-    def _score(self, grouping: Grouping, is_answer:bool = False) -> Tuple[int, bool, int]:
-        score = len(grouping), is_answer, -Strategy.wcs(grouping)
-        return score
-
-    @staticmethod
-    def wcs(grouping: Grouping) -> int:
-        return max(len(pruned) for pruned in grouping.values())
+        best = top(1, metrics.splits, metrics.is_answer, -metrics.largest)[0]
+        return space.word_list[best]
 
 
 class Greedy(Strategy):
@@ -26,31 +32,35 @@ class Greedy(Strategy):
     Tries to get the most chance to hit soon
     """
 
+    @timed("strategy.choose")
     def choose(self, space: Space) -> str:
         logging.debug("Choosing in space among %d words available" % len(space))
-        chunked_answers = list(answers for choice in space.values() for answers in choice.values())
-        answers = set(ans for answers in chunked_answers for ans in answers)
-
-        top10 = sorted(space.items(), key=lambda it: self._score(it[1], it[0] in answers), reverse=True)[:10]
-        return (list(filter(lambda t: t[0] in answers, top10)) + top10)[0][0]
+        space = PatternSpace.of(space)
+        metrics = space.metrics
 
-    def _score(self, grouping: Grouping, is_answer:bool = False):
-        hit_it_big = sum(1 for v in grouping.values() if len(v) == 1)
-        n_splits = len(grouping)
-        worst_case = max(len(v) for v in grouping.values())
-        return hit_it_big, n_splits, is_answer, -worst_case
+        top10 = top(10, metrics.singletons, metrics.splits, metrics.is_answer, -metrics.largest)
+        return space.word_list[(list(filter(lambda i: metrics.is_answer[i], top10)) + top10)[0]]
 
 
 class Heuristic(Strategy):
     def __init__(self, threshold_for_guessing=5):
         self.threshold_for_guessing = threshold_for_guessing
 
+    @property
+    def key(self) -> str:
+        return "%s(%d)" % (type(self).__name__, self.threshold_for_guessing)
+
+    @timed("strategy.choose")
     def choose(self, space: Space):
-        chunked_answers = list(answers for choice in space.values() for answers in choice.values())
-        self.answers = set(ans for answers in chunked_answers for ans in answers)
+        # Which words it looks at depends on every word there is, so none are left out
+        space = PatternSpace.of(space)
+        self.answers = set(space.answers.tolist())
 
         logging.debug("Choosing in space among %d words and %d answers available" % (len(space), len(self.answers)))
-        best = sorted(space.items(), key=lambda sp: self.__comparer(sp), reverse=True)
+        metrics = space.metrics
+        keys = metrics.splits, -metrics.largest, metrics.is_answer
+        # Groupings are only built for the few words that get looked at
+        best = ((word, space[word]) for word in (space.word_list[i] for i in ranked(*keys)))
 
         def gen_best(best: Iterable[Tuple[str, Grouping]], limit: int):
             counter = 0
@@ -64,12 +74,204 @@ class Heuristic(Strategy):
                 last = cur
 
         displayed = list(gen_best(best, self.threshold_for_guessing))
-        first_solution = next(filter(lambda p: p[0] in self.answers, best))
-        if first_solution not in displayed[:5] and len(displayed[0][1]) > self.threshold_for_guessing:
+        first_solution = space.word_list[top(1, metrics.is_answer, *keys)[0]]
+        if first_solution not in [word for word, _ in displayed[:5]] and len(displayed[0][1]) > self.threshold_for_guessing:
             return displayed[0][0]
         else:
-            return first_solution[0]
+            return first_solution
+
+
+class Scoring(Strategy):
+    """
+    Ranks every word of the space at once, out of the histograms of the
+    sizes of its groups, preferring words that may be the answer among
+    those scoring the same.
+    """
+
+    @timed("strategy.choose")
+    def choose(self, space: Space) -> str:
+        return self.best(space)[0]
+
+    def best(self, space: Space, k: int = 1) -> List[str]:
+        space = PatternSpace.of(space).representatives
+        logging.debug("Choosing in space among %d words available" % len(space))
+        metrics = space.metrics
+        scores = self.metric(metrics)
+        if scores is None:
+            sizes = space.group_sizes
+            scores = self.scores(sizes, len(space.answers), sizes.shape[1] - 1)
+        return [space.word_list[i] for i in top(k, scores, metrics.is_answer)]
+
+    @timed("strategy.best_jointly")
+    def best_jointly(self, space: PatternSpace, boards: Sequence[np.ndarray], k: int = 1,
+                     allowed: Optional[np.ndarray] = None) -> List[str]:
+        """
+        Best words to guess on several boards at once, scoring each word by
+        the sum of its scores on every board. boards holds the columns of
+        space still eligible on each board, and allowed (if given) tells
+        which words of the space can be guessed. Among words scoring the
+        same, the ones most likely to solve a board right away come first.
+        """
+        logging.debug("Choosing in space among %d words for %d boards" % (len(space), len(boards)))
+        n_patterns = 3 ** space.length
+        scores = np.zeros(len(space))
+        hits = np.zeros(len(space))
+        # Boards left with the same answers (such as every board on the first guess) are only scored once
+        known: Dict[bytes, Tuple[np.ndarray, np.ndarray]] = dict()
+        for columns in boards:
+            key = columns.tobytes()
+            if key not in known:
+                sizes = pattern_counts(space.codes[:, columns], n_patterns)
+                solved = sizes.shape[1] - 1
+                known[key] = self.scores(sizes, len(columns), solved), sizes[:, solved] / max(len(columns), 1)
+            board_scores, board_hits = known[key]
+            scores += board_scores
+            hits += board_hits
+        scores = np.round(scores, 9)
+        if allowed is not None:
+            scores[~allowed] = -np.inf
+        return [space.word_list[i] for i in top(k, scores, hits)]
+
+    def metric(self, metrics: GuessMetrics) -> Optional[np.ndarray]:
+        """
+        The scores, when they are one of the metrics already computed for the space
+        """
+        return None
+
+    def scores(self, sizes: np.ndarray, n_answers: int, solved: int) -> np.ndarray:
+        """
+        Score of every word (the higher the better) out of its group sizes,
+        as pattern_counts gives them. solved is the column of the solved
+        pattern.
+        """
+        raise NotImplementedError()
+
+
+class Entropy(Scoring):
+    """
+    Picks the word whose pattern tells the most about the answer (in bits)
+    """
+
+    def metric(self, metrics: GuessMetrics) -> Optional[np.ndarray]:
+        return metrics.entropy
+
+    def scores(self, sizes: np.ndarray, n_answers: int, solved: int) -> np.ndarray:
+        return entropy(sizes, n_answers)
 
-    def __comparer(self, g: Tuple[str, Grouping]):
-        return len(g[1]), -max(len(v) for v in g[1].values()), g[0] in self.answers
 
+class ExpectedSize(Scoring):
+    """
+    Picks the word leaving the fewest answers on average
+    """
+
+    def metric(self, metrics: GuessMetrics) -> Optional[np.ndarray]:
+        return -metrics.expected_size
+
+    def scores(self, sizes: np.ndarray, n_answers: int, solved: int) -> np.ndarray:
+        return -expected_size(sizes, n_answers)
+
+
+class ExpectedGuesses(Scoring):
+    """
+    Picks the word solving in the fewest guesses on average, estimating that
+    a group of n answers takes 1 + log4(n) more guesses (1 for a single
+    answer, 1.5 for two of them). Hitting the answer right away saves them
+    all, which favours words that may be the answer.
+    """
+
+    def scores(self, sizes: np.ndarray, n_answers: int, solved: int) -> np.ndarray:
+        counts = np.arange(n_answers + 1)
+        # Guesses left for all the answers of a group of each size
+        left = counts * (1 + np.log2(np.maximum(counts, 1)) / 2)
+        total = row_sums(left, sizes) - left[sizes[:, solved]]
+        return -np.round(1 + total / max(n_answers, 1), 9)
+
+
+# Words scored at once by Sampling, between checks of the time left
+RACE_CHUNK = 1024
+# Words of a race, best first, with their estimated entropy, its standard error, and how many answers were sampled
+Race = Tuple[List[int], np.ndarray, np.ndarray, int]
+
+
+class Sampling(Strategy):
+    """
+    Picks the word whose pattern tells the most about the answer, like
+    Entropy, but estimated from a random sample of the answers, so every
+    guess is chosen within time_budget seconds whatever the size of the
+    dictionary. Every word is scored on the first sample answers, then the
+    words are raced (successive halving): each round drops the words whose
+    estimate can't reach the best ones (by confidence standard errors),
+    then the worse half of the rest, and doubles the sample. Rounds stop
+    when a single word is left, when the sample holds every answer (where
+    estimates are exact) or when the next round would not be done in time.
+    A round running out of time keeps the words it scored (the best ones
+    first), so even the first one, over every word, stays within budget.
+    """
+
+    def __init__(self, time_budget: float = 1.0, sample: int = 64, confidence: float = 2.0,
+                 seed: Optional[int] = None):
+        self.time_budget = time_budget
+        self.sample = sample
+        self.confidence = confidence
+        self.seed = seed
+
+    @property
+    def key(self) -> str:
+        return "%s(%g, %d, %g)" % (type(self).__name__, self.time_budget, self.sample, self.confidence)
+
+    @timed("strategy.choose")
+    def choose(self, space: Space) -> str:
+        return self.best(space)[0]
+
+    def best(self, space: Space, k: int = 1) -> List[str]:
+        space = PatternSpace.of(space).representatives
+        words, _, _, _ = self.race(space, k, time.perf_counter() + self.time_budget)
+        return [space.word_list[i] for i in words]
+
+    @timed("strategy.race")
+    def race(self, space: PatternSpace, k: int, deadline: float) -> Race:
+        """
+        The k best words of space by estimated entropy, racing them until
+        deadline (a time.perf_counter value)
+        """
+        n = len(space.answers)
+        rng = np.random.default_rng(self.seed)
+        order = rng.permutation(n)
+        # In random order, so the words left out when the first round runs out of time are any
+        candidates = rng.permutation(len(space))
+        m = min(n, self.sample)
+        while True:
+            start = time.perf_counter()
+            estimate, error = self.__score(space, candidates, np.sort(order[:m]), n, deadline)
+            candidates = candidates[:len(estimate)]
+            logging.debug("Raced %d words on %d of %d answers" % (len(candidates), m, n))
+            now = time.perf_counter()
+            if len(candidates) <= k or m == n or now + (now - start) > deadline:
+                break
+            # Words whose upper bound is below the lower bound of the k-th best can't make it
+            lower = estimate - self.confidence * error
+            keep = np.flatnonzero(estimate + self.confidence * error >= np.partition(lower, -k)[-k])
+            # Best first, so they are the ones scored if the next round runs out of time
+            candidates = candidates[keep[top(min(len(keep), max(k, len(candidates) // 2)), estimate[keep])]]
+            m = min(n, 2 * m)
+        best = top(k, estimate, space.answer_words[candidates])
+        return candidates[best].tolist(), estimate[best], error[best], m
+
+    @staticmethod
+    def __score(space: PatternSpace, candidates: np.ndarray, columns: np.ndarray, n_answers: int,
+                deadline: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Estimated entropy (and its error) of candidates, on the answers in
+        columns, in the order of candidates. Once past deadline, only the
+        candidates scored so far are (at least one chunk of them).
+        """
+        estimates, errors = [], []
+        for start in range(0, len(candidates), RACE_CHUNK):
+            rows = candidates[start:start + RACE_CHUNK]
+            sizes = pattern_counts(np.asarray(space.codes[np.ix_(rows, columns)]), 3 ** space.length)
+            estimate, error = sampled_entropy(sizes, len(columns), n_answers)
+            estimates.append(estimate)
+            errors.append(error)
+            if time.perf_counter() > deadline:
+                break
+        return np.concatenate(estimates), np.concatenate(errors)
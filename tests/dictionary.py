@@ -0,0 +1,36 @@
+"""
+A small dictionary for tests: few enough answers to check by hand, with
+repeated letters so yellows are counted against greens
+"""
+import os
+from typing import List, Sequence, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ANSWERS = ["cigar", "rebut", "sissy", "humph", "awake", "blush", "focal", "evade", "naval", "serve", "heath",
+           "dwarf", "model", "karma", "stink", "grade", "quiet", "bench", "abate", "feign"]
+WORDS = ANSWERS + ["raise", "roate", "salet", "trace", "crane", "eerie", "mamma", "xylyl", "fuzzy", "llama",
+                   "vivid", "queue", "geese", "onion", "adieu"]
+
+
+def write_dictionary(directory: str, answers: Sequence[str] = ANSWERS,
+                     words: Sequence[str] = WORDS) -> Tuple[str, str]:
+    """
+    Write answers and words as the files of a game, returning their paths
+    """
+    paths = os.path.join(directory, "answers"), os.path.join(directory, "words")
+    for path, lines in zip(paths, (answers, words)):
+        with open(path, "w") as outfile:
+            outfile.write("\n".join(lines) + "\n")
+    return paths
+
+
+def bundled(step_answers: int = 23, step_words: int = 97) -> Tuple[List[str], List[str]]:
+    """
+    A slice of the bundled wordle lists, with every answer also a word
+    """
+    def read(path: str, step: int) -> List[str]:
+        with open(os.path.join(ROOT, path)) as infile:
+            return [line.strip() for line in infile if line.strip()][::step]
+    answers = read("wordle/answers", step_answers)
+    return answers, sorted(set(answers + read("wordle/words", step_words)))
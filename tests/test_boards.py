@@ -0,0 +1,49 @@
+import pytest
+
+from dictionary import ANSWERS, WORDS, write_dictionary
+from model import Boards, Engine, MaskInstance
+
+
+@pytest.fixture
+def engine(tmp_path) -> Engine:
+    return Engine(*write_dictionary(str(tmp_path)))
+
+
+def matching(answers, *turns) -> list:
+    return [answer for answer in answers if all(mi.matches(answer) for mi in turns)]
+
+
+def test_every_board_keeps_its_own_answers(engine: Engine):
+    hidden = ["sissy", "karma", "bench", "evade"]
+    boards = Boards(engine, len(hidden))
+    assert boards.answer_lists() == [ANSWERS] * len(hidden)
+
+    history = [[] for _ in hidden]
+    for guess in ("raise", "llama", "geese"):
+        masks = [MaskInstance.for_answer(answer, guess) for answer in hidden]
+        boards = boards.pruned(*masks)
+        for turns, mi in zip(history, masks):
+            turns.append(mi)
+        assert boards.answer_lists() == [matching(ANSWERS, *turns) for turns in history]
+    for answer, answers in zip(hidden, boards.answer_lists()):
+        assert answer in answers
+
+
+def test_solved_boards_are_dropped(engine: Engine):
+    boards = Boards(engine, 3).pruned(*[MaskInstance.for_answer(answer, "karma") for answer in
+                                        ("sissy", "karma", "bench")])
+    assert len(boards) == 2
+    assert boards.answer_lists() == [matching(ANSWERS, MaskInstance.for_answer(answer, "karma"))
+                                     for answer in ("sissy", "bench")]
+    with pytest.raises(ValueError):
+        boards.pruned(MaskInstance.for_answer("sissy", "raise"))
+
+
+def test_hard_mode_prunes_the_words(tmp_path):
+    engine = Engine(*write_dictionary(str(tmp_path)), hard_mode=True)
+    masks = [MaskInstance.for_answer(answer, "raise") for answer in ("sissy", "karma")]
+    boards = Boards(engine, 2).pruned(*masks)
+    assert boards.engine.word_list == [word for word in WORDS if any(mi.matches(word) for mi in masks)]
+    # Without hard mode, the engine stays as it was
+    boards = Boards(Engine(*write_dictionary(str(tmp_path))), 2).pruned(*masks)
+    assert boards.engine.word_list == WORDS
@@ -0,0 +1,49 @@
+import tempfile
+
+import pytest
+
+from dictionary import write_dictionary
+from gameplay.computer import Computer
+from gameplay.data import get_cache_file
+from gameplay.memo import GuessMemo
+from model import Engine, MaskInstance, PatternMatrix
+from strategies import Entropy
+
+
+@pytest.fixture
+def builds(tmp_path, monkeypatch):
+    """
+    Calls of PatternMatrix.build, with caches kept under tmp_path
+    """
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    calls = []
+    build = PatternMatrix.build
+
+    def counted(self, *args, **kwargs):
+        calls.append(len(self.words))
+        return build(self, *args, **kwargs)
+    monkeypatch.setattr(PatternMatrix, "build", counted)
+    return calls
+
+
+def test_memo_miss_after_hits_narrows_the_cached_space(tmp_path, builds):
+    files = write_dictionary(str(tmp_path))
+    memo, strategy = GuessMemo(), Entropy()
+
+    first = Computer(Engine(*files), memo=memo)
+    opener = first.best_guess(strategy)
+    assert len(builds) == 1
+
+    # The opener is remembered, so this game never loads a space until a state the memo has not seen
+    computer = Computer(Engine(*files), memo=memo)
+    assert computer.best_guess(strategy) == opener
+    computer.update(MaskInstance.for_answer("feign", opener))
+    guess = computer.best_guess(strategy)
+    assert len(builds) == 1
+    assert [str(p) for p in tmp_path.glob("slytherin-cache.*")] == [get_cache_file(Engine(*files).game_id())]
+
+    # As chosen without the memo, from the space narrowed turn by turn
+    fresh = Computer(Engine(*files))
+    fresh.solution_space
+    fresh.update(MaskInstance.for_answer("feign", opener))
+    assert strategy.choose(fresh.solution_space) == guess
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from dictionary import ANSWERS, WORDS, write_dictionary
+from model import Constraints, Engine, Mask, MaskInstance, PatternMatrix
+from model.masks import pattern_code
+
+# Repeated letters, in the guess, in the answers or both
+GUESSES = ["raise", "sissy", "geese", "eerie", "mamma", "llama", "abate", "queue", "xylyl", "evade", "serve"]
+
+
+def scored(answers, mi: MaskInstance):
+    """
+    The answers giving mi, found by scoring every one of them
+    """
+    return [answer for answer in answers if pattern_code(answer, mi.cause) == mi.mask.code]
+
+
+@pytest.fixture(scope="module")
+def patterns() -> PatternMatrix:
+    return PatternMatrix(WORDS, ANSWERS)
+
+
+@pytest.mark.parametrize("guess", GUESSES)
+def test_answers_for_matches_scoring(patterns: PatternMatrix, guess: str):
+    for answer in ANSWERS + [guess]:
+        mi = MaskInstance.for_answer(answer, guess)
+        found = patterns.inverted.answers_for(mi)
+        assert [ANSWERS[i] for i in np.flatnonzero(found)] == scored(ANSWERS, mi)
+
+
+def test_solved_mask_leaves_the_guess(patterns: PatternMatrix):
+    for answer in ANSWERS:
+        mi = MaskInstance.for_answer(answer, answer)
+        assert mi.mask.solved
+        assert [ANSWERS[i] for i in np.flatnonzero(patterns.inverted.answers_for(mi))] == [answer]
+
+
+def test_masks_no_answer_gives_match_nothing(patterns: PatternMatrix):
+    # A yellow after a gray copy of the same letter can't happen, whatever the answer
+    mi = MaskInstance(Mask([0, 0, 1, 0, 0]), "geese")
+    assert not patterns.inverted.answers_for(mi).any()
+    assert scored(ANSWERS, mi) == []
+
+
+@pytest.mark.parametrize("answer", ["sissy", "serve", "abate", "feign"])
+def test_matching_merged_constraints(tmp_path, answer: str):
+    engine = Engine(*write_dictionary(str(tmp_path)))
+    turns = [MaskInstance.for_answer(answer, guess) for guess in ("geese", "sissy", "llama")]
+    constraints = Constraints()
+    expected = list(ANSWERS)
+    for mi in turns:
+        constraints = constraints.merged(Constraints.of(mi))
+        expected = scored(expected, mi)
+        assert engine.matching(constraints) == expected
+        assert answer in expected
+
+    # Only eligible answers match
+    pruned = engine.pruned(turns[0])
+    assert pruned.matching(Constraints()) == scored(ANSWERS, turns[0])
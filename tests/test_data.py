@@ -0,0 +1,68 @@
+import os
+import pathlib
+import tempfile
+
+import numpy as np
+import pytest
+
+from dictionary import ANSWERS, WORDS
+from gameplay.data import HEADER, VERSION, fetch_cache, get_cache_file, load_space, replace_atomically, save_cache
+from model import PatternMatrix, PatternSpace
+
+
+@pytest.fixture
+def space(tmp_path, monkeypatch) -> PatternSpace:
+    # Caches go to the temporary directory: this one, for the test
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    patterns = PatternMatrix(WORDS, ANSWERS)
+    return PatternSpace(patterns.word_array, patterns.answer_array, patterns.codes, patterns.length)
+
+
+def test_saved_space_loads_back(space: PatternSpace):
+    assert fetch_cache("game") is None
+    save_cache("game", space)
+    loaded = fetch_cache("game")
+    assert loaded.word_list == space.word_list
+    assert loaded.answers.tolist() == space.answers.tolist()
+    assert loaded.length == space.length
+    np.testing.assert_array_equal(loaded.codes, space.codes)
+    assert loaded["raise"] == space["raise"]
+
+
+def test_replacing_is_atomic(space: PatternSpace, tmp_path):
+    save_cache("game", space)
+    cachefile = get_cache_file("game")
+    before = pathlib.Path(cachefile).read_bytes()
+
+    def fail(outfile):
+        outfile.write(b"partial")
+        raise RuntimeError("interrupted")
+    with pytest.raises(RuntimeError):
+        replace_atomically(cachefile, fail)
+    # Neither the partial file nor its temporary name are left behind
+    assert pathlib.Path(cachefile).read_bytes() == before
+    assert os.listdir(str(tmp_path)) == [os.path.basename(cachefile)]
+
+    replace_atomically(cachefile, lambda outfile: outfile.write(b"new"))
+    assert pathlib.Path(cachefile).read_bytes() == b"new"
+    assert os.listdir(str(tmp_path)) == [os.path.basename(cachefile)]
+
+
+def test_other_versions_are_refused(space: PatternSpace):
+    save_cache("game", space)
+    cachefile = get_cache_file("game")
+    with open(cachefile, "r+b") as outfile:
+        magic, version, *rest = HEADER.unpack(outfile.read(HEADER.size))
+        outfile.seek(0)
+        outfile.write(HEADER.pack(magic, VERSION + 1, *rest))
+    with pytest.raises(ValueError):
+        load_space(cachefile)
+    assert fetch_cache("game") is None
+
+
+def test_truncated_files_are_refused(space: PatternSpace):
+    save_cache("game", space)
+    cachefile = get_cache_file("game")
+    with open(cachefile, "r+b") as outfile:
+        outfile.truncate(os.path.getsize(cachefile) - 1)
+    assert fetch_cache("game") is None
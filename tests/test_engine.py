@@ -0,0 +1,16 @@
+from dictionary import ANSWERS, write_dictionary
+from model import Engine, MaskInstance
+
+
+def test_game_id_follows_words_not_file_order(tmp_path):
+    (tmp_path / "reversed").mkdir()
+    engine = Engine(*write_dictionary(str(tmp_path)))
+    reversed_engine = Engine(*write_dictionary(str(tmp_path / "reversed"), ANSWERS[::-1]))
+    assert engine.game_id() == reversed_engine.game_id()
+
+    only_cigar = MaskInstance.for_answer("cigar", "raise")
+    only_feign = MaskInstance.for_answer("feign", "cigar")
+    assert engine.pruned(only_cigar).game_id() == reversed_engine.pruned(only_cigar).game_id()
+    # Both are left with the answer at index 0 of their file, which is not the same answer
+    assert engine.pruned(only_cigar).answer_ids.tolist() == reversed_engine.pruned(only_feign).answer_ids.tolist()
+    assert engine.pruned(only_cigar).game_id() != reversed_engine.pruned(only_feign).game_id()
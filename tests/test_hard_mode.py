@@ -0,0 +1,48 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from dictionary import ANSWERS, WORDS, bundled, write_dictionary
+from model import Constraints, Engine, MaskInstance, PatternMatrix
+
+
+def baseline(words, *turns) -> list:
+    """
+    Words allowed in hard mode as they were first pruned: every word, checked against every mask of every turn
+    """
+    return [word for word in words if all(any(mi.matches(word) for mi in turn) for turn in turns)]
+
+
+@pytest.fixture(params=["fixture", "wordle"])
+def patterns(request) -> PatternMatrix:
+    answers, words = (ANSWERS, WORDS) if request.param == "fixture" else bundled(97, 199)
+    return PatternMatrix(words, answers)
+
+
+def test_allowed_follows_every_mask(patterns: PatternMatrix):
+    index = patterns.word_letters
+    for guess, answer in itertools.product(["geese", "sissy", "llama", "raise", "abate"], patterns.answers[::3]):
+        mi = MaskInstance.for_answer(answer, guess)
+        allowed = Constraints.of(mi).allowed(index)
+        assert [patterns.words[i] for i in np.flatnonzero(allowed)] == baseline(patterns.words, [mi])
+
+
+@pytest.mark.parametrize("answer", ["sissy", "serve", "abate", "feign", "evade"])
+def test_hard_mode_engine_keeps_the_baseline_words(tmp_path, answer: str):
+    engine = Engine(*write_dictionary(str(tmp_path)), hard_mode=True)
+    turns = []
+    for guess in ("geese", "eerie", "llama", "sissy"):
+        turn = [MaskInstance.for_answer(answer, guess)]
+        turns.append(turn)
+        engine = engine.pruned(*turn)
+        assert engine.word_list == baseline(WORDS, *turns)
+
+
+def test_several_masks_allow_words_following_any(tmp_path):
+    engine = Engine(*write_dictionary(str(tmp_path)), hard_mode=True)
+    first = [MaskInstance.for_answer(answer, "raise") for answer in ("sissy", "karma")]
+    second = [MaskInstance.for_answer(answer, "llama") for answer in ("sissy", "karma")]
+    engine = engine.pruned(*first)
+    assert engine.word_list == baseline(WORDS, first)
+    assert engine.pruned(*second).word_list == baseline(WORDS, first, second)
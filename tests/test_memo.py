@@ -0,0 +1,52 @@
+import pickle
+import time
+
+from gameplay.memo import GuessMemo
+
+
+def test_memo_in_memory():
+    memo = GuessMemo(capacity=2)
+    assert memo.get("game", "Entropy", "state") is None
+    memo.put("game", "Entropy", "state", "raise")
+    assert memo.get("game", "Entropy", "state") == "raise"
+    assert memo.get("game", "Greedy", "state") is None
+    assert memo.get("other", "Entropy", "state") is None
+
+    # The least recently used entry goes first
+    memo.put("game", "Entropy", "second", "count")
+    memo.get("game", "Entropy", "state")
+    memo.put("game", "Entropy", "third", "lambs")
+    assert len(memo) == 2
+    assert memo.get("game", "Entropy", "second") is None
+    assert memo.get("game", "Entropy", "state") == "raise"
+
+
+def test_memo_on_disk(tmp_path):
+    path = str(tmp_path / "memo.sqlite")
+    memo = GuessMemo(path)
+    memo.put("game", "stats", "state", {"best": ["raise", "arise"], "left": 12})
+    memo.close()
+
+    reopened = GuessMemo(path)
+    assert reopened.get("game", "stats", "state") == {"best": ["raise", "arise"], "left": 12}
+    # As a worker gets it: the settings, with the database opened again
+    unpickled = pickle.loads(pickle.dumps(reopened))
+    assert unpickled.path == path and len(unpickled) == 0
+    assert unpickled.get("game", "stats", "state") == {"best": ["raise", "arise"], "left": 12}
+    reopened.close()
+    unpickled.close()
+
+
+def test_memo_on_disk_keeps_the_most_recently_used(tmp_path):
+    path = str(tmp_path / "memo.sqlite")
+    memo = GuessMemo(path, capacity=1, max_rows=2)
+    for i in range(4):
+        memo.put("game", "Entropy", "state %d" % i, i)
+        # Entries are told apart by when they were last used
+        time.sleep(0.01)
+    memo.close()
+
+    # Rows past max_rows are evicted when the database is opened
+    reopened = GuessMemo(path, capacity=1, max_rows=2)
+    assert [reopened.get("game", "Entropy", "state %d" % i) for i in range(4)] == [None, None, 2, 3]
+    reopened.close()
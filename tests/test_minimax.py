@@ -0,0 +1,72 @@
+from functools import lru_cache
+
+import pytest
+
+from dictionary import ANSWERS, WORDS, bundled, write_dictionary
+from model import Engine, Mask
+from model.masks import pattern_code
+from model.minimax import MinimaxSolver
+from model.tree import DecisionTree
+
+
+def worst_case(answers, words) -> int:
+    """
+    Guesses the best tree takes in the worst case, by trying every word in every state
+    """
+    solved = 3 ** len(answers[0]) - 1
+
+    @lru_cache(maxsize=None)
+    def depth(state: frozenset) -> int:
+        if len(state) == 1:
+            return 1
+        best = len(state) + 1
+        for word in words:
+            groups = dict()
+            for answer in state:
+                groups.setdefault(pattern_code(answer, word), []).append(answer)
+            if len(groups) == 1 and word not in state:
+                continue
+            best = min(best, max(1 + depth(frozenset(group)) if code != solved else 1
+                                 for code, group in groups.items()))
+        return best
+    return depth(frozenset(answers))
+
+
+def guesses(tree: DecisionTree, answer: str):
+    """
+    Guesses the tree plays against answer, up to the one solving it (if it does)
+    """
+    played = []
+    while tree is not None:
+        played.append(tree.guess)
+        mask = Mask.for_answer(answer, tree.guess)
+        if mask.solved:
+            return played
+        tree = tree.next(mask)
+    return None
+
+
+@pytest.mark.parametrize("dictionary", ["fixture", "wordle"])
+def test_minimax_finds_the_best_worst_case(tmp_path, dictionary: str):
+    answers, words = (ANSWERS, WORDS) if dictionary == "fixture" else bundled(197, 797)
+    engine = Engine(*write_dictionary(str(tmp_path), answers, words))
+    tree = MinimaxSolver(engine).solve()
+    assert tree.depth == worst_case(answers, words)
+    for answer in answers:
+        played = guesses(tree, answer)
+        assert played is not None and len(played) <= tree.depth
+
+
+def test_minimax_among_fewer_candidates_is_an_upper_bound(tmp_path):
+    engine = Engine(*write_dictionary(str(tmp_path)))
+    exact = MinimaxSolver(engine).solve().depth
+    tree = MinimaxSolver(engine, candidates=2).solve()
+    assert tree.depth >= exact
+    assert all(guesses(tree, answer) is not None for answer in ANSWERS)
+
+
+def test_minimax_fails_under_its_depth_limit(tmp_path):
+    engine = Engine(*write_dictionary(str(tmp_path)))
+    exact = MinimaxSolver(engine).solve().depth
+    with pytest.raises(ValueError):
+        MinimaxSolver(engine, max_depth=exact - 1).solve()
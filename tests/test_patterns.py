@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from dictionary import ANSWERS, WORDS, bundled
+from model import Mask, MaskInstance, PatternMatrix
+
+
+@pytest.fixture(params=["fixture", "wordle"])
+def patterns(request) -> PatternMatrix:
+    answers, words = (ANSWERS, WORDS) if request.param == "fixture" else bundled(97, 499)
+    return PatternMatrix(words, answers)
+
+
+def test_codes_match_masks(patterns: PatternMatrix):
+    expected = np.array([[Mask.for_answer(answer, word).code for answer in patterns.answers]
+                         for word in patterns.words])
+    np.testing.assert_array_equal(patterns.codes, expected)
+
+
+def test_masks_match_the_answers_they_were_scored_against(patterns: PatternMatrix):
+    # MaskInstance.matches checks the rules of the feedback one answer at a time, without codes
+    for word in patterns.words[::7]:
+        row = patterns.row(word)
+        for code in np.unique(row):
+            mi = MaskInstance(Mask.of(int(code), patterns.length), word)
+            assert [a for a in patterns.answers if mi.matches(a)] == \
+                [a for a, c in zip(patterns.answers, row) if c == code]
+
+
+def test_words_outside_the_dictionary_are_scored_on_demand(patterns: PatternMatrix):
+    for word in ["zzzzz", "eeeee", "abcde"]:
+        assert word not in patterns.word_index
+        assert patterns.row(word).tolist() == [Mask.for_answer(answer, word).code for answer in patterns.answers]
+
+
+def test_solved_code(patterns: PatternMatrix):
+    for answer in patterns.answers:
+        assert patterns.row(answer)[patterns.answer_index[answer]] == 3 ** patterns.length - 1
@@ -0,0 +1,57 @@
+import json
+import tempfile
+from functools import partial
+
+import pytest
+
+from dictionary import ANSWERS, write_dictionary
+from gameplay.replay import replay
+from model import Engine
+
+
+@pytest.fixture
+def replayed(tmp_path, monkeypatch):
+    """
+    What replay tells of games (given as objects or raw lines), on the small dictionary
+    """
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    new_engine = partial(Engine, *write_dictionary(str(tmp_path)))
+
+    def results(*games) -> list:
+        lines = [game if isinstance(game, str) else json.dumps(game) for game in games]
+        return [json.loads(line) for line in replay(new_engine, lines)]
+    return results
+
+
+def test_games_are_replayed_in_order(replayed):
+    games = [{"answer": "sissy", "guesses": ["raise", "sissy"], "id": "a"},
+             {"answer": "karma", "guesses": ["raise", "llama", "karma"]},
+             {"answer": "bench", "guesses": ["raise", "geese"]}]
+    first, second, third = replayed(*games)
+    assert [first["id"], first["line"], second["line"], third["line"]] == ["a", 1, 2, 3]
+    assert (first["solved"], second["solved"], third["solved"]) == (2, 3, None)
+
+    turn = first["turns"][0]
+    assert turn["remaining"] == len(ANSWERS)
+    assert turn["splits"] <= turn["best_splits"] and turn["largest"] >= turn["best_largest"]
+    assert turn["expected"] >= turn["best_expected"]
+    assert second["turns"][1]["remaining"] < len(ANSWERS)
+
+
+def test_guesses_that_no_longer_split_are_scored(replayed):
+    result, = replayed({"answer": "karma", "guesses": ["raise", "raise", "karma"]})
+    again = result["turns"][1]
+    assert "error" not in again
+    assert (again["splits"], again["largest"], again["expected"]) == (1, again["remaining"], again["remaining"])
+    assert result["solved"] == 3
+
+
+def test_bad_lines_do_not_stop_the_run(replayed):
+    results = replayed("not json", {"answer": "zzzzz", "guesses": ["raise"]},
+                       {"answer": "karma", "guesses": ["rai", "karma"]},
+                       {"answer": "karma", "guesses": ["qqqqq", "karma"]},
+                       {"answer": "karma", "guesses": ["karma"]})
+    assert [result["line"] for result in results] == [1, 2, 3, 4, 5]
+    assert all("error" in result for result in results[:3])
+    assert results[3]["turns"][0]["error"] == "not a word of the game" and results[3]["solved"] == 2
+    assert results[4]["solved"] == 1
@@ -0,0 +1,62 @@
+import asyncio
+import json
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from dictionary import write_dictionary
+from gameplay.serve import SolverService
+from gameplay.workers import main_computer
+from model import Engine, MaskInstance
+from strategies import Entropy, Greedy
+
+
+@pytest.fixture
+def ask(tmp_path, monkeypatch):
+    """
+    Answer request objects one at a time, as a service over the small dictionary would
+    """
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    engine = Engine(*write_dictionary(str(tmp_path)))
+    main_computer(engine, 1)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        service = SolverService(engine, {"entropy": Entropy(), "greedy": Greedy()}, "entropy", executor)
+
+        def answer(request) -> dict:
+            line = request if isinstance(request, str) else json.dumps(request)
+            return asyncio.run(service.handle(line))
+        yield answer
+
+
+@pytest.mark.parametrize("answer", ["sissy", "karma", "feign"])
+def test_sessions_play_to_the_answer(ask, answer: str):
+    session = ask({"op": "new", "id": 1})["session"]
+    for turn in range(1, 7):
+        guess = ask({"op": "suggest", "session": session, "id": "s%d" % turn})["guess"]
+        mask = "".join(str(d) for d in MaskInstance.for_answer(answer, guess).mask.mask)
+        if guess == answer:
+            break
+        left = ask({"op": "feedback", "session": session, "guess": guess, "mask": mask, "id": turn})
+        assert left["id"] == turn and answer in left["answers"]
+    assert guess == answer
+    assert ask({"op": "close", "session": session}) == {"closed": session}
+
+
+def test_sessions_are_independent(ask):
+    first, second = ask({"op": "new"})["session"], ask({"op": "new"})["session"]
+    assert first != second
+    ask({"op": "feedback", "session": first, "guess": "raise", "mask": "00000"})
+    assert ask({"op": "stats", "session": second})["splits"]
+    assert ask({"op": "suggest", "session": second, "strategy": "greedy"})["guess"]
+
+
+def test_every_request_is_answered(ask):
+    session = ask({"op": "new"})["session"]
+    assert "error" in ask("not json")
+    assert "error" in ask({"op": "suggest", "session": "nope", "id": 3})
+    assert ask({"op": "feedback", "session": session, "guess": "raise", "mask": "012", "id": 4})["id"] == 4
+    assert "error" in ask({"op": "suggest", "session": session, "strategy": "unknown"})
+    # Feedback no answer follows leaves nothing to suggest, which is still answered
+    ask({"op": "feedback", "session": session, "guess": "raise", "mask": "22222"})
+    assert ask({"op": "suggest", "session": session, "id": 5}) == {"remaining": 0, "answers": [], "id": 5}
@@ -0,0 +1,58 @@
+import math
+
+import numpy as np
+import pytest
+
+from dictionary import ANSWERS, WORDS, bundled
+import model.space
+from model import PatternMatrix, PatternSpace
+
+
+@pytest.fixture(params=["fixture", "wordle"])
+def space(request) -> PatternSpace:
+    answers, words = (ANSWERS, WORDS) if request.param == "fixture" else bundled()
+    patterns = PatternMatrix(words, answers)
+    return PatternSpace(patterns.word_array, patterns.answer_array, patterns.codes, patterns.length)
+
+
+def test_metrics_match_groupings(space: PatternSpace):
+    metrics = space.metrics
+    answers = set(space.answers.tolist())
+    n = len(answers)
+    for i, word in enumerate(space.word_list):
+        sizes = [len(group) for group in space[word].values()]
+        assert sum(sizes) == n
+        assert metrics.splits[i] == len(sizes)
+        assert metrics.largest[i] == max(sizes)
+        assert metrics.singletons[i] == sum(1 for size in sizes if size == 1)
+        assert metrics.entropy[i] == pytest.approx(-sum(s / n * math.log2(s / n) for s in sizes), abs=1e-8)
+        assert metrics.expected_size[i] == pytest.approx(sum(s * s for s in sizes) / n)
+        assert bool(metrics.is_answer[i]) == (word in answers)
+
+
+def test_metrics_of_packed_groupings(space: PatternSpace):
+    # The same space, rebuilt from its groupings, splits its answers the same way
+    packed = PatternSpace.of({word: space[word] for word in space.word_list})
+    assert packed.word_list == space.word_list
+    for name in ("splits", "largest", "singletons", "entropy", "expected_size"):
+        np.testing.assert_allclose(getattr(packed.metrics, name), getattr(space.metrics, name))
+
+
+def test_collapsed_space_shares_metrics(space: PatternSpace, monkeypatch):
+    # As late in a game, where many words split the few answers left alike
+    answers = space.answers[:6].tolist()
+    space = space.narrowed(answers, lambda word: word in answers)
+    space.metrics.entropy
+    counted = []
+    monkeypatch.setattr(model.space, "pattern_counts", lambda *args: counted.append(args))
+    collapsed = space.collapsed()
+    assert len(collapsed) < len(space)
+    collapsed.metrics.entropy, collapsed.group_sizes
+    assert counted == []
+    monkeypatch.undo()
+    keep = [space.index[word] for word in collapsed.word_list]
+    computed = PatternSpace(collapsed.words, collapsed.answers, collapsed.codes, collapsed.length)
+    np.testing.assert_array_equal(collapsed.group_sizes, computed.group_sizes)
+    for name in ("splits", "largest", "singletons", "entropy", "expected_size", "is_answer"):
+        np.testing.assert_allclose(getattr(collapsed.metrics, name), getattr(computed.metrics, name))
+        np.testing.assert_array_equal(getattr(collapsed.metrics, name), getattr(space.metrics, name)[keep])